@@ -1,5 +1,4 @@
 import pathlib
-import pandas as pd
 
 from ..logging import logger
 from ..data import Dataset
@@ -9,8 +8,6 @@ from ..models.model_list import load_model
 from ..utils import load_json, save_json
 from ..models.model_list import get_model_list
 
-from sklearn.metrics import accuracy_score
-
 __all__ = [
     'available_scorers',
     'available_analyses',
@@ -63,6 +60,8 @@ def available_scorers(keys_only=True):
     -----------------
     'accuracy_score': sklearn.metrics.accuracy_score
     """
+    from sklearn.metrics import accuracy_score
+
     _SCORERS = {
         'accuracy_score': accuracy_score,
     }
@@ -165,6 +164,8 @@ def score_predictions(predictions_list=None,
     -------
     filenames of created data
     '''
+    import pandas as pd
+
     analysis_metadata = {}
 
     if predictions_dir is None:
@@ -0,0 +1,415 @@
+'''Benchmarks for performance-sensitive parts of the workflow
+
+Each benchmark generates (or reads) its own data, and returns a
+pandas DataFrame of results, one row per configuration.
+'''
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .logging import logger
+from .paths import project_dir
+from .utils import current_rss, peak_rss
+
+__all__ = [
+    'benchmark_imports',
+    'benchmark_index_to_date_time',
+    'benchmark_model_io',
+    'benchmark_pivot',
+    'benchmark_read_space_delimited',
+    'benchmark_reservoir_sample',
+    'heavy_imports',
+    'import_times',
+    'make_space_delimited_file',
+]
+
+def _best_time(func, repeat=3):
+    """Return the fastest of `repeat` wall-clock timings of `func()`, in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+def benchmark_pivot(sizes=(10**4, 10**5, 10**6), n_index=1000, n_columns=50,
+                    aggfuncs=('sum', 'mean', 'count'), repeat=3, random_state=0):
+    """Compare `DataFrame.pivot_table` with `fast_pivot` on synthetic data
+
+    Parameters
+    ----------
+    sizes: list of int
+        Number of rows in each synthetic DataFrame
+    n_index, n_columns: int
+        Number of distinct values in the index and columns keys
+    aggfuncs: list of {'sum', 'mean', 'count'}
+        Aggregation functions to compare
+    repeat: int
+        Timings are the fastest of `repeat` runs
+    random_state: int
+        Seed for the synthetic data
+
+    Returns
+    -------
+    DataFrame with columns: n_rows, aggfunc, pandas_s, fast_s, speedup
+    """
+    from .data.transformers import fast_pivot
+
+    rng = np.random.RandomState(random_state)
+    results = []
+    for n_rows in sizes:
+        df = pd.DataFrame({
+            'index': rng.randint(n_index, size=n_rows),
+            'columns': rng.randint(n_columns, size=n_rows),
+            'values': rng.rand(n_rows),
+        })
+        for aggfunc in aggfuncs:
+            opts = dict(index='index', columns='columns', values='values', aggfunc=aggfunc)
+            pandas_s = _best_time(lambda: df.pivot_table(**opts), repeat=repeat)
+            fast_s = _best_time(lambda: fast_pivot(df, **opts), repeat=repeat)
+            logger.info(f"pivot: {n_rows} rows, {aggfunc}: pivot_table {pandas_s:.4f}s, "
+                        f"fast_pivot {fast_s:.4f}s")
+            results.append({'n_rows': n_rows, 'aggfunc': aggfunc,
+                            'pandas_s': pandas_s, 'fast_s': fast_s,
+                            'speedup': pandas_s / fast_s})
+    return pd.DataFrame(results)
+
+def benchmark_index_to_date_time(sizes=(10**4, 10**5, 10**6), freq='s', repeat=3):
+    """Compare the object and compact modes of the `index_to_date_time` transformer
+
+    For each mode, measures the time to build the Date/Time columns, the memory
+    footprint of the resulting DataFrame, and the time and file size of `Dataset.dump`.
+
+    Parameters
+    ----------
+    sizes: list of int
+        Number of rows in each synthetic DataFrame
+    freq: pandas frequency string
+        Spacing of the synthetic DatetimeIndex
+    repeat: int
+        Build timings are the fastest of `repeat` runs
+
+    Returns
+    -------
+    DataFrame with columns: n_rows, compact, build_s, memory_bytes, dump_s, dump_bytes
+    """
+    from .data import Dataset
+    from .data.transformers import index_to_date_time
+
+    results = []
+    for n_rows in sizes:
+        index = pd.date_range('2000-01-01', periods=n_rows, freq=freq)
+        dset = Dataset(dataset_name='benchmark', update_hashes=False,
+                       data=pd.DataFrame({'value': np.arange(n_rows)}, index=index))
+        for compact in [False, True]:
+            build_s = _best_time(lambda: index_to_date_time(dset, compact=compact),
+                                 repeat=repeat)
+            new_ds = index_to_date_time(dset, compact=compact)
+            with tempfile.TemporaryDirectory() as tmpdir:
+                start_time = time.perf_counter()
+                new_ds.dump(dump_path=tmpdir)
+                dump_s = time.perf_counter() - start_time
+                dump_bytes = os.path.getsize(os.path.join(tmpdir, f'{new_ds.name}.dataset'))
+            memory_bytes = int(new_ds.data.memory_usage(deep=True).sum())
+            logger.info(f"index_to_date_time: {n_rows} rows, compact={compact}: "
+                        f"build {build_s:.4f}s, {memory_bytes} bytes, dump {dump_s:.4f}s")
+            results.append({'n_rows': n_rows, 'compact': compact, 'build_s': build_s,
+                            'memory_bytes': memory_bytes, 'dump_s': dump_s,
+                            'dump_bytes': dump_bytes})
+    return pd.DataFrame(results)
+
+def make_space_delimited_file(filename, n_rows=10**6, n_cols=20, n_classes=10,
+                              random_state=0, block_rows=10**5):
+    """Write a synthetic space-delimited file of float features and a class label
+
+    Rows are generated `block_rows` at a time, so arbitrarily large
+    files can be written in bounded memory.
+
+    Returns
+    -------
+    size of the written file, in bytes
+    """
+    rng = np.random.RandomState(random_state)
+    with open(filename, 'w') as fw:
+        for start in range(0, n_rows, block_rows):
+            n_block = min(block_rows, n_rows - start)
+            df = pd.DataFrame(rng.rand(n_block, n_cols).round(6))
+            df[n_cols] = [f'class_{c}' for c in rng.randint(n_classes, size=n_block)]
+            df.to_csv(fw, sep=' ', header=False, index=False)
+    return os.path.getsize(filename)
+
+def _run_read_space_delimited(filename, read_opts):
+    """Read `filename` in full, returning (n_rows, seconds, peak_rss)"""
+    from .data.utils import read_space_delimited
+
+    start_time = time.perf_counter()
+    result = read_space_delimited(filename, **read_opts)
+    if read_opts.get('chunksize', None) is not None:
+        n_rows = sum(data.shape[0] for data, target in result)
+    else:
+        n_rows = result[0].shape[0]
+    return n_rows, time.perf_counter() - start_time, peak_rss()
+
+def benchmark_read_space_delimited(filename, configs=None):
+    """Measure `read_space_delimited` throughput and peak memory use on a file
+
+    Each configuration is run in a fresh process, so peak memory use
+    is measured independently for each. See `make_space_delimited_file`
+    for generating a test file.
+
+    Parameters
+    ----------
+    filename: path
+        space-delimited file to read
+    configs: list of dicts, or None
+        keyword arguments for `read_space_delimited`. By default, compares
+        string data, typed data, typed data with categorical targets,
+        and typed data read in chunks.
+
+    Returns
+    -------
+    DataFrame with columns: config, n_rows, seconds, rows_per_s, peak_rss_bytes
+    """
+    if configs is None:
+        configs = [
+            {},
+            {'dtype': None},
+            {'dtype': None, 'categorical_target': True},
+            {'dtype': None, 'categorical_target': True, 'chunksize': 10**5},
+        ]
+    results = []
+    for read_opts in configs:
+        with ProcessPoolExecutor(max_workers=1,
+                                 mp_context=multiprocessing.get_context('spawn')) as executor:
+            n_rows, seconds, max_rss = executor.submit(_run_read_space_delimited,
+                                                       str(filename), read_opts).result()
+        logger.info(f"read_space_delimited {read_opts}: {n_rows} rows in {seconds:.2f}s, "
+                    f"peak RSS {max_rss} bytes")
+        results.append({'config': repr(read_opts), 'n_rows': n_rows, 'seconds': seconds,
+                        'rows_per_s': n_rows / seconds, 'peak_rss_bytes': max_rss})
+    return pd.DataFrame(results)
+
+def benchmark_reservoir_sample(filename, n_samples=1000, n_jobs=(1, 2, 4),
+                               block_size=2**20, random_seed=0):
+    """Measure the throughput of `reservoir_sample` on a file
+
+    See `make_space_delimited_file` for generating a test file.
+
+    Parameters
+    ----------
+    filename: path
+        file to sample
+    n_samples: int
+        reservoir size
+    n_jobs: list of int
+        degrees of parallelism to compare
+    block_size: int
+        size of blocks to read, in bytes
+    random_seed: int
+        seed passed to `reservoir_sample`
+
+    Returns
+    -------
+    DataFrame with columns: n_jobs, seconds, mb_per_s
+    """
+    from .data.utils import reservoir_sample
+
+    size_mb = os.path.getsize(filename) / 2**20
+    results = []
+    for jobs in n_jobs:
+        start_time = time.perf_counter()
+        reservoir_sample(filename, n_samples=n_samples, random_seed=random_seed,
+                         n_jobs=jobs, block_size=block_size)
+        seconds = time.perf_counter() - start_time
+        logger.info(f"reservoir_sample: n_jobs={jobs}: {size_mb:.1f} MB in {seconds:.2f}s")
+        results.append({'n_jobs': jobs, 'seconds': seconds, 'mb_per_s': size_mb / seconds})
+    return pd.DataFrame(results)
+
+def _default_io_models():
+    """A large tree ensemble and a large linear model, with the data to fit them on"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import SGDClassifier
+    return {
+        'forest': (RandomForestClassifier(n_estimators=500, n_jobs=-1, random_state=0),
+                   {'n_samples': 10**4, 'n_features': 20, 'n_classes': 2}),
+        'linear': (SGDClassifier(max_iter=5, tol=None, random_state=0),
+                   {'n_samples': 200, 'n_features': 5 * 10**4, 'n_classes': 50}),
+    }
+
+def _run_load_model(model_name, model_path, mmap_mode):
+    """Load a model, returning (seconds, increase in RSS in bytes)"""
+    import joblib  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+    import sklearn.linear_model  # noqa: F401
+    from .models import load_model
+
+    baseline_rss = current_rss()
+    start_time = time.perf_counter()
+    model, _ = load_model(model_name, model_path=model_path, mmap_mode=mmap_mode)
+    seconds = time.perf_counter() - start_time
+    if baseline_rss is None:
+        return seconds, None
+    return seconds, current_rss() - baseline_rss
+
+def benchmark_model_io(models=None, compress=(0, 3), mmap_modes=(None, 'r'), repeat=3):
+    """Measure the size, load time and memory use of saved models
+
+    Each model is fit on synthetic data, and saved (with `save_model`) using
+    each of the `compress` settings. Every load (with `load_model`) is run in
+    a fresh process, so that memory use is measured independently: `rss_bytes`
+    is the increase in resident memory due to the loaded model (memory-mapped
+    arrays only become resident as they are used).
+
+    Parameters
+    ----------
+    models: dict, or None
+        mapping a name to a tuple (estimator, make_classification options).
+        By default, a 500-tree random forest and a linear model with
+        50 classes and 50000 features.
+    compress: list
+        `save_model` compression settings to compare
+    mmap_modes: list
+        `load_model` mmap modes to compare. Ignored for compressed models.
+    repeat: int
+        Timings are the fastest of `repeat` runs
+
+    Returns
+    -------
+    DataFrame with columns: model, compress, mmap_mode, file_bytes, save_s,
+    load_s, rss_bytes
+    """
+    from sklearn.datasets import make_classification
+    from .models import save_model
+
+    if models is None:
+        models = _default_io_models()
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, (estimator, data_opts) in models.items():
+            X, y = make_classification(n_informative=min(10, data_opts['n_features']),
+                                       random_state=0, **data_opts)
+            model = estimator.fit(X, y)
+            del X, y
+            for level in compress:
+                model_name = f'{name}_{level}'
+                start_time = time.perf_counter()
+                save_model(model_name=model_name, model=model, model_path=tmpdir,
+                           compress=level)
+                save_s = time.perf_counter() - start_time
+                file_bytes = os.path.getsize(os.path.join(tmpdir, f'{model_name}.model'))
+                for mmap_mode in mmap_modes:
+                    if level and mmap_mode is not None:
+                        continue
+                    runs = []
+                    for _ in range(repeat):
+                        with ProcessPoolExecutor(max_workers=1,
+                                                 mp_context=multiprocessing.get_context('spawn')
+                                                 ) as executor:
+                            runs.append(executor.submit(_run_load_model, model_name,
+                                                        tmpdir, mmap_mode).result())
+                    load_s = min(seconds for seconds, _ in runs)
+                    rss_bytes = runs[0][1]
+                    logger.info(f"model io: {name}, compress={level}, mmap_mode={mmap_mode}: "
+                                f"{file_bytes} bytes, save {save_s:.2f}s, load {load_s:.3f}s, "
+                                f"RSS +{rss_bytes} bytes")
+                    results.append({'model': name, 'compress': level, 'mmap_mode': mmap_mode,
+                                    'file_bytes': file_bytes, 'save_s': save_s,
+                                    'load_s': load_s, 'rss_bytes': rss_bytes})
+    return pd.DataFrame(results)
+
+# Modules that should only be imported by the code that actually uses them
+_HEAVY_MODULES = ['joblib', 'pandas', 'requests', 'sklearn']
+
+# Modules run by the `make` targets (plus the workflow API)
+_ENTRY_POINT_MODULES = [
+    'folklore.workflow',
+    'folklore.data.make_dataset',
+    'folklore.data.apply_transforms',
+    'folklore.models.train_models',
+    'folklore.models.predict_model',
+    'folklore.analysis.run_analysis',
+]
+
+def import_times(module):
+    """Import `module` in a fresh interpreter, and report the cost of each import
+
+    Uses `python -X importtime`. Modules imported during interpreter
+    startup (e.g. by `site`) are included.
+
+    Returns
+    -------
+    dict mapping the name of every imported module to its
+    cumulative import time (in microseconds)
+    """
+    env = {**os.environ,
+           'PYTHONPATH': os.pathsep.join([str(project_dir), os.environ.get('PYTHONPATH', '')])}
+    # run from the project directory: `-c` puts the working directory on sys.path,
+    # and inside the package, its modules (e.g. `logging`) shadow the standard library
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          env=env, cwd=project_dir, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        raise Exception(f"Failed to import {module}: {proc.stderr.splitlines()[-1:]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # header line
+        times[fields[2].strip()] = int(fields[1])
+    return times
+
+def heavy_imports(module, heavy=None):
+    """List the expensive packages that get imported along with `module`
+
+    Heavy packages should be imported by the functions that use them,
+    so that commands that don't need them start quickly.
+
+    heavy: list or None
+        top-level package names to look for. Default: joblib, pandas, requests, sklearn
+
+    Examples
+    --------
+    >>> [m for m in _ENTRY_POINT_MODULES if heavy_imports(m)]
+    []
+    """
+    if heavy is None:
+        heavy = _HEAVY_MODULES
+    imported = {name.split('.')[0] for name in import_times(module)}
+    return sorted(imported.intersection(heavy))
+
+def benchmark_imports(modules=None, repeat=3):
+    """Measure the time taken to import each of `modules` in a fresh interpreter
+
+    Parameters
+    ----------
+    modules: list of str, or None
+        Modules to import. By default, the modules run by the `make` targets.
+    repeat: int
+        Timings are the fastest of `repeat` runs
+
+    Returns
+    -------
+    DataFrame with columns: module, import_s, n_modules, heavy_imports
+    """
+    if modules is None:
+        modules = _ENTRY_POINT_MODULES
+    results = []
+    for module in modules:
+        runs = [import_times(module) for _ in range(repeat)]
+        import_s = min(times[module] for times in runs) / 1e6
+        imported = {name.split('.')[0] for name in runs[0]}
+        heavy = sorted(imported.intersection(_HEAVY_MODULES))
+        logger.info(f"import {module}: {import_s:.3f}s, {len(runs[0])} modules, "
+                    f"heavy imports: {heavy}")
+        results.append({'module': module, 'import_s': import_s,
+                        'n_modules': len(runs[0]), 'heavy_imports': heavy})
+    return pd.DataFrame(results)
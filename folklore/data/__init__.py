@@ -1,3 +1,4 @@
+from .cache import *
 from .datasets import *
 from .fetch import *
 from .localdata import *
@@ -0,0 +1,261 @@
+import contextlib
+import os
+import pathlib
+import time
+
+from ..logging import logger
+from ..paths import interim_data_path
+from ..utils import load_json, save_json
+
+__all__ = [
+    'DatasetCache',
+]
+
+class DatasetCache(object):
+    """Size- and age-bounded cache of Dataset objects
+
+    `RawDataset.process` caches generated Datasets in `interim_data_path`, as
+    `{key}.dataset` and `{key}.metadata` files. This object evicts the least
+    recently used entries when the cache exceeds `max_bytes`, or entries that
+    haven't been used in `max_age` seconds.
+
+    An entry's last access time is the modification time of its files: a
+    cache hit (see `touch`) just updates the modification time of the
+    `.metadata` file, without taking a lock or rewriting any index.
+
+    Several processes may share a cache. Entries being written can be
+    reserved (see `reserve`), so that concurrent prunes leave them alone.
+    Reservations are recorded in `index_file`, which is only updated under
+    a lock (on `{index_file}.lock`, where `fcntl` is available), and
+    replaced atomically.
+    """
+
+    # reservations older than this (in seconds) are assumed abandoned
+    reservation_timeout = 24 * 60 * 60
+
+    def __init__(self, cache_path=None, max_bytes=None, max_age=None,
+                 index_file='cache_index.json'):
+        """Create a cache manager
+
+        Parameters
+        ----------
+        cache_path: path (default: `interim_data_path`)
+            Location of cached Dataset files
+        max_bytes: int or None
+            Maximum total size of the cache. If None, uses the
+            FOLKLORE_CACHE_MAX_BYTES environment variable (if set).
+        max_age: int or None
+            Maximum time (in seconds) since an entry was last used. If None,
+            uses the FOLKLORE_CACHE_MAX_AGE environment variable (if set).
+        index_file: string
+            Name of the json file (in `cache_path`) used to record reservations
+        """
+        if cache_path is None:
+            cache_path = interim_data_path
+        if max_bytes is None and os.environ.get('FOLKLORE_CACHE_MAX_BYTES'):
+            max_bytes = int(os.environ['FOLKLORE_CACHE_MAX_BYTES'])
+        if max_age is None and os.environ.get('FOLKLORE_CACHE_MAX_AGE'):
+            max_age = float(os.environ['FOLKLORE_CACHE_MAX_AGE'])
+        self.cache_path = pathlib.Path(cache_path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_file = index_file
+
+    def _load_index(self):
+        try:
+            return load_json(self.cache_path / self.index_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        os.makedirs(self.cache_path, exist_ok=True)
+        index_fq = self.cache_path / self.index_file
+        tmp_fq = index_fq.with_name(f'{index_fq.name}.{os.getpid()}.tmp')
+        save_json(tmp_fq, index)
+        os.replace(tmp_fq, index_fq)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the cache lock (if file locking is available on this platform)"""
+        os.makedirs(self.cache_path, exist_ok=True)
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        with open(self.cache_path / f'{self.index_file}.lock', 'a') as fd:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _reserved(self, record, now):
+        """Is an index record a reservation by a (still running) writer?"""
+        pid = record.get('writer', None)
+        if pid is None or now - record['last_access'] > self.reservation_timeout:
+            return False
+        if pid == os.getpid() or os.name != 'posix':
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _files(self, key):
+        return [self.cache_path / f'{key}.dataset', self.cache_path / f'{key}.metadata']
+
+    def entries(self):
+        """Return the current cache entries
+
+        Returns
+        -------
+        dict mapping cache keys to dicts with keys:
+            size: total size (in bytes) of the entry's files
+            last_access: time (in seconds since the epoch) the entry was last used
+        """
+        entries = {}
+        for dataset_fq in self.cache_path.glob('*.dataset'):
+            key = dataset_fq.stem
+            size = 0
+            mtime = 0
+            for file_fq in self._files(key):
+                try:
+                    stat = file_fq.stat()
+                except FileNotFoundError:
+                    continue
+                size += stat.st_size
+                mtime = max(mtime, stat.st_mtime)
+            entries[key] = {'size': size, 'last_access': mtime}
+        return entries
+
+    def touch(self, key):
+        """Record a use of the cache entry `key`"""
+        try:
+            os.utime(self.cache_path / f'{key}.metadata')
+        except FileNotFoundError:
+            pass  # evicted meanwhile
+
+    def reserve(self, key):
+        """Record that the cache entry `key` is about to be written
+
+        Until `add(key)` (or `evict(key)`) is called, prunes won't evict it.
+        """
+        with self._locked():
+            index = self._load_index()
+            index[key] = {'last_access': time.time(), 'writer': os.getpid()}
+            self._save_index(index)
+
+    def add(self, key):
+        """Record a newly written cache entry (ending its reservation), and prune the cache
+
+        The new entry itself is never evicted by this call.
+        """
+        self.touch(key)
+        with self._locked():
+            index = self._load_index()
+            index.pop(key, None)
+            self._prune(index, self.max_bytes, self.max_age, keep=[key])
+            self._save_index(index)
+
+    def _evict(self, key, index):
+        for file_fq in self._files(key):
+            try:
+                file_fq.unlink()
+            except FileNotFoundError:
+                pass
+        index.pop(key, None)
+        logger.debug(f"Evicted cached Dataset: {key}")
+
+    def evict(self, key):
+        """Remove the cache entry `key` from disk"""
+        with self._locked():
+            index = self._load_index()
+            self._evict(key, index)
+            self._save_index(index)
+
+    def prune(self, max_bytes=None, max_age=None, keep=None):
+        """Evict cache entries until the cache is within its limits
+
+        Entries older than `max_age` are evicted first. Then, least recently
+        used entries are evicted until the total size is at most `max_bytes`.
+
+        Parameters
+        ----------
+        max_bytes: int or None
+            Size limit. If None, use `self.max_bytes`
+        max_age: int or None
+            Age limit (in seconds). If None, use `self.max_age`
+        keep: list or None
+            keys that must not be evicted
+
+        Returns
+        -------
+        list of evicted keys
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        if max_age is None:
+            max_age = self.max_age
+        with self._locked():
+            index = self._load_index()
+            evicted = self._prune(index, max_bytes, max_age, keep=keep)
+            self._save_index(index)
+        return evicted
+
+    def _prune(self, index, max_bytes, max_age, keep=None):
+        """Prune the cache, updating `index` (which the caller must save)"""
+        if keep is None:
+            keep = []
+        now = time.time()
+        keep = set(keep) | {key for key, record in index.items()
+                            if self._reserved(record, now)}
+
+        entries = self.entries()
+        # forget abandoned reservations (and any other stale records)
+        for key in list(index):
+            if key not in keep:
+                del index[key]
+
+        lru = sorted(entries, key=lambda k: entries[k]['last_access'])
+        total_bytes = sum(entry['size'] for entry in entries.values())
+        evicted = []
+        for key in lru:
+            if key in keep:
+                continue
+            too_old = max_age is not None and now - entries[key]['last_access'] > max_age
+            too_big = max_bytes is not None and total_bytes > max_bytes
+            if not (too_old or too_big):
+                continue
+            self._evict(key, index)
+            total_bytes -= entries[key]['size']
+            evicted.append(key)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} cached Datasets from {self.cache_path}")
+        return evicted
+
+    def stats(self):
+        """Summarize the cache contents
+
+        Returns
+        -------
+        dict with keys:
+            entries: number of cached Datasets
+            total_bytes: total size of the cache
+            max_bytes, max_age: current cache limits
+            oldest_access, newest_access: range of last access times (or None)
+        """
+        entries = self.entries()
+        accesses = [entry['last_access'] for entry in entries.values()]
+        return {
+            'entries': len(entries),
+            'total_bytes': sum(entry['size'] for entry in entries.values()),
+            'max_bytes': self.max_bytes,
+            'max_age': self.max_age,
+            'oldest_access': min(accesses) if accesses else None,
+            'newest_access': max(accesses) if accesses else None,
+        }
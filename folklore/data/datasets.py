@@ -1,17 +1,20 @@
+import copy
 import os
 import pathlib
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-import joblib
-from sklearn.datasets.base import Bunch
-from sklearn.model_selection import train_test_split
+import numpy as np
 from functools import partial
 
+from .. import __version__
 from ..paths import processed_data_path, data_path, raw_data_path, interim_data_path
 from ..logging import logger
+from .cache import DatasetCache
 from .fetch import fetch_file, unpack, get_dataset_filename
-from .utils import partial_call_signature, serialize_partial, deserialize_partial, process_dataset_default
-from ..utils import load_json, save_json
+from .utils import (partial_call_signature, serialize_partial, deserialize_partial,
+                    process_dataset_default, function_fingerprint)
+from ..utils import load_json, save_json, resolve_n_jobs
 
 __all__ = [
     'Dataset',
@@ -49,7 +52,40 @@ def available_datasets(dataset_path=None, keys_only=True):
     return ds_dict
 
 
-def process_raw_datasets(raw_datasets=None, action='process'):
+def _run_raw_dataset_action(dataset_name, action, catch_errors=True):
+    """Run a single `process_raw_datasets` action on a single raw dataset.
+
+    catch_errors: boolean
+        If True, errors are caught and returned in the result.
+        Otherwise, they are raised.
+
+    Returns
+    -------
+    Tuple (dataset_name, result), where result is a dict containing either
+    the outcome of `action`, or the `error` that occurred.
+    """
+    try:
+        raw_ds = RawDataset.from_name(dataset_name)
+        logger.info(f'Running {action} on {dataset_name}')
+        if action == 'fetch':
+            result = {'fetched': raw_ds.fetch()}
+        elif action == 'unpack':
+            result = {'unpack_path': str(raw_ds.unpack())}
+        elif action == 'process':
+            ds = raw_ds.process()
+            shape = getattr(ds.data, 'shape', None)
+            logger.info(f'{dataset_name}: processed data has shape:{shape}')
+            result = {'shape': shape}
+        else:
+            raise Exception(f'Unknown action: {action}')
+    except Exception as err:
+        if not catch_errors:
+            raise
+        logger.error(f'{action} failed on {dataset_name}: {err!r}')
+        result = {'error': repr(err)}
+    return dataset_name, result
+
+def process_raw_datasets(raw_datasets=None, action='process', n_jobs=1, raise_errors=True):
     """Fetch, Unpack, and Process raw datasets.
 
     Parameters
@@ -62,20 +98,49 @@ def process_raw_datasets(raw_datasets=None, action='process'):
             'fetch': download raw files
             'unpack': unpack raw files
             'process': generate and cache Dataset objects
+    n_jobs: int
+        Number of raw datasets to work on at once. If -1, use all CPUs.
+        'process' runs in a pool of processes; 'fetch' and 'unpack'
+        (which are mostly I/O) run in a pool of threads.
+    raise_errors: boolean
+        If True, an exception is raised if `action` fails on any dataset:
+        immediately when running serially, or once every worker has
+        finished when running in parallel. If False, failures are only
+        logged, and reported in the returned results.
+
+    Returns
+    -------
+    Dict mapping raw dataset names to a result dict. If `action` failed on a
+    dataset (and `raise_errors` is False), its result contains the key `error`;
+    the remaining datasets are still processed.
     """
     if raw_datasets is None:
         raw_datasets = available_raw_datasets()
+    n_jobs = resolve_n_jobs(n_jobs)
 
-    for dataset_name in raw_datasets:
-        raw_ds = RawDataset.from_name(dataset_name)
-        logger.info(f'Running {action} on {dataset_name}')
-        if action == 'fetch':
-            raw_ds.fetch()
-        elif action == 'unpack':
-            raw_ds.unpack()
-        elif action == 'process':
-            ds = raw_ds.process()
-            logger.info(f'{dataset_name}: processed data has shape:{ds.data.shape}')
+    results = {}
+    if n_jobs == 1:
+        for dataset_name in raw_datasets:
+            _, results[dataset_name] = _run_raw_dataset_action(dataset_name, action,
+                                                               catch_errors=not raise_errors)
+    else:
+        if action == 'process':
+            executor_class = ProcessPoolExecutor
+        else:
+            executor_class = ThreadPoolExecutor
+        with executor_class(max_workers=n_jobs) as executor:
+            futures = [executor.submit(_run_raw_dataset_action, dataset_name, action)
+                       for dataset_name in raw_datasets]
+            for future in as_completed(futures):
+                dataset_name, results[dataset_name] = future.result()
+
+    failed = [name for name, result in results.items() if 'error' in result]
+    if failed:
+        logger.error(f'{action} failed on {len(failed)} of {len(results)} raw datasets: {failed}')
+        if raise_errors:
+            raise Exception(f'{action} failed on raw datasets: ' +
+                            '; '.join(f"{name}: {results[name]['error']}" for name in failed))
+    return results
 
 def add_raw_dataset(rawds):
     """Add a raw dataset to the list of available raw datasets"""
@@ -84,11 +149,45 @@ def add_raw_dataset(rawds):
     rawds_list[rawds.name] = rawds.to_dict()
     save_json(rds_file_fq, rawds_list)
 
+# Parsed raw dataset files, keyed by filename: (mtime_ns, size, raw_dataset_dict)
+_RAW_DATASET_REGISTRY = {}
+
+def _raw_dataset_file(raw_dataset_file='raw_datasets.json', raw_dataset_path=None):
+    """Fully qualified location of a raw dataset file"""
+    if raw_dataset_path is None:
+        raw_dataset_path = _MODULE_DIR
+    return pathlib.Path(raw_dataset_path) / raw_dataset_file
+
+def _raw_dataset_registry(raw_dataset_file_fq):
+    """Return the parsed contents of a raw dataset file.
+
+    The file is only re-read if its modification time or size has changed
+    since it was last parsed. The returned dict is shared, and must not be modified.
+
+    Returns
+    -------
+    dict mapping raw dataset names to their dict representation,
+    or None if the file does not exist
+    """
+    key = str(raw_dataset_file_fq)
+    try:
+        stat = os.stat(raw_dataset_file_fq)
+    except FileNotFoundError:
+        _RAW_DATASET_REGISTRY.pop(key, None)
+        return None
+    cached = _RAW_DATASET_REGISTRY.get(key, None)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    raw_dataset_dict = load_json(raw_dataset_file_fq)
+    _RAW_DATASET_REGISTRY[key] = (stat.st_mtime_ns, stat.st_size, raw_dataset_dict)
+    return raw_dataset_dict
+
 def available_raw_datasets(raw_dataset_file='raw_datasets.json',
                            raw_dataset_path=None, keys_only=True):
     """Returns the list of available datasets.
 
     Instructions for creating RawDatasets is stored in `raw_datasets.json` by default.
+    The file is parsed once, and re-read only when it changes on disk.
 
     keys_only: boolean
         if True, return a list of available datasets (default)
@@ -101,21 +200,45 @@ def available_raw_datasets(raw_dataset_file='raw_datasets.json',
     else:
         Tuple (available_raw_dataset_dict, available_raw_dataset_dict_filename)
     """
-    if raw_dataset_path is None:
-        raw_dataset_path = _MODULE_DIR
+    raw_dataset_file_fq = _raw_dataset_file(raw_dataset_file, raw_dataset_path)
+    raw_dataset_dict = _raw_dataset_registry(raw_dataset_file_fq)
 
-    raw_dataset_file_fq = pathlib.Path(raw_dataset_path) / raw_dataset_file
-
-    if not raw_dataset_file_fq.exists():
+    if raw_dataset_dict is None:
         raw_dataset_dict = {}
         logger.warning(f"No dataset file found: {raw_dataset_file}")
-    else:
-        raw_dataset_dict = load_json(raw_dataset_file_fq)
 
     if keys_only:
         return list(raw_dataset_dict.keys())
 
-    return raw_dataset_dict, raw_dataset_file_fq
+    return copy.deepcopy(raw_dataset_dict), raw_dataset_file_fq
+
+
+class Bunch(dict):
+    """Container object exposing keys as attributes
+
+    A minimal stand-in for scikit-learn's `Bunch`, so that working with
+    Datasets doesn't require importing scikit-learn.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(kwargs)
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __dir__(self):
+        return self.keys()
+
+    def __getattr__(self, key):
+        try:
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
+
+    def __setstate__(self, state):
+        # Bunch pickles may contain a non-empty __dict__; keys are restored
+        # by dict's own pickling, so there is nothing to do here.
+        pass
 
 
 class Dataset(Bunch):
@@ -201,9 +324,17 @@ class Dataset(Bunch):
         return self['target'] is not None
 
     @classmethod
-    def load(cls, file_base, data_path=None, metadata_only=False):
+    def load(cls, file_base, data_path=None, metadata_only=False, mmap_mode=None):
         """Load a dataset
-        must be present in dataset.json"""
+        must be present in dataset.json
+
+        metadata_only: boolean
+            If True, load only the standalone metadata
+        mmap_mode: {None, 'r+', 'r', 'w+', 'c'}
+            If not None, numpy arrays in the dataset are memory-mapped from
+            disk (using the given mode) rather than read into memory.
+        """
+        import joblib
 
         if data_path is None:
             data_path = processed_data_path
@@ -216,10 +347,110 @@ class Dataset(Bunch):
                 meta = joblib.load(fd)
             return meta
 
-        with open(data_path / f'{file_base}.dataset', 'rb') as fd:
-            ds = joblib.load(fd)
+        dataset_fq = data_path / f'{file_base}.dataset'
+        indices_fq = data_path / f'{file_base}.indices'
+        if not dataset_fq.exists() and indices_fq.exists():
+            return cls.load_view(file_base, data_path=data_path, mmap_mode=mmap_mode)
+
+        ds = joblib.load(str(dataset_fq), mmap_mode=mmap_mode)
         return ds
 
+    @classmethod
+    def load_view(cls, file_base, data_path=None, mmap_mode=None):
+        """Load a dataset stored as a set of row indices into a base dataset
+
+        Views are written by transformers (e.g. `kfold_split`) that would
+        otherwise need to write many full copies of the same data.
+        The view's metadata names the `base_dataset`, and `{file_base}.indices`
+        contains the rows to select from it.
+
+        mmap_mode: {None, 'r+', 'r', 'w+', 'c'}
+            If not None, the base dataset is memory-mapped, and only the
+            selected rows are read into memory.
+
+        Raises an exception if the base dataset has changed (its hashes differ
+        from the `base_data_hash` and `base_target_hash` recorded in the view),
+        as the indices may no longer select the intended rows.
+        """
+        import joblib
+
+        if data_path is None:
+            data_path = processed_data_path
+        else:
+            data_path = pathlib.Path(data_path)
+
+        metadata = cls.load(file_base, data_path=data_path, metadata_only=True)
+        indices = joblib.load(data_path / f'{file_base}.indices')
+        base = cls.load(metadata['base_dataset'], data_path=data_path, mmap_mode=mmap_mode)
+        for key in ['data_hash', 'target_hash']:
+            if metadata.get(f'base_{key}', None) != base.metadata.get(key, None):
+                raise Exception(f"Dataset view {file_base} is stale: its base dataset "
+                                f"{metadata['base_dataset']} has changed since it was "
+                                "written. Regenerate the view.")
+
+        def take(arr):
+            if arr is None:
+                return None
+            if hasattr(arr, 'iloc'):
+                return arr.iloc[indices]
+            return arr[indices]
+
+        return cls(dataset_name=metadata['dataset_name'], metadata=metadata,
+                   data=take(base.data), target=take(base.target),
+                   update_hashes=False)
+
+    def dump_view(self, indices, file_base, dump_path=None, force=True,
+                  create_dirs=True, **metadata):
+        """Dump a view of this dataset: a subset of its rows, stored as indices.
+
+        The view can be loaded with `Dataset.load(file_base)`. This dataset
+        must already have been dumped (under its own name) to `dump_path`.
+
+        indices: array-like of int
+            rows of this dataset to include in the view
+        file_base: string
+            Name of the view
+        dump_path: path. (default: `processed_data_path`)
+            Directory where the view will be dumped.
+        force: boolean
+            If False, raise an exception if the view already exists
+            If True, overwrite any existing files
+        create_dirs: boolean
+            If True, `dump_path` will be created (if necessary)
+        **metadata:
+            Additional metadata to store with the view
+        """
+        import joblib
+
+        if dump_path is None:
+            dump_path = processed_data_path
+        dump_path = pathlib.Path(dump_path)
+
+        metadata_fq = dump_path / f'{file_base}.metadata'
+        if metadata_fq.exists() and force is not True:
+            raise Exception(f'Metadata file {metadata_fq.name} exists already. '
+                            'Use `force=True` to overwrite, or change `file_base`')
+        if create_dirs:
+            os.makedirs(dump_path, exist_ok=True)
+
+        indices = np.asarray(indices)
+        if indices.size == 0 or indices.max() < np.iinfo(np.int32).max:
+            indices = indices.astype(np.int32)
+
+        view_meta = {k:v for k, v in self.metadata.items()
+                     if k not in ['data_hash', 'target_hash']}
+        view_meta = {**view_meta, **metadata,
+                     'dataset_name': file_base,
+                     'base_dataset': self.name,
+                     'base_data_hash': self.metadata.get('data_hash', None),
+                     'base_target_hash': self.metadata.get('target_hash', None),
+                     'indices_hash': joblib.hash(indices,
+                                                 hash_name=self.metadata.get('hash_type', 'sha1')),
+                     }
+        _dump_replace(indices, dump_path / f'{file_base}.indices')
+        _dump_replace(view_meta, metadata_fq)
+        logger.debug(f'Wrote Dataset View: {file_base}')
+
     @classmethod
     def from_raw(cls, dataset_name,
                  cache_path=None,
@@ -230,7 +461,9 @@ class Dataset(Bunch):
         '''Creates Dataset object from a named RawDataset.
 
         Dataset will be cached after creation. Subsequent calls with matching call
-        signature will return this cached object.
+        signature will return this cached object. If the raw files were fetched
+        previously, and are unchanged, the cache is checked first, so a cached
+        Dataset is returned without fetching or unpacking anything.
 
         Parameters
         ----------
@@ -251,10 +484,19 @@ class Dataset(Bunch):
 
         Remaining keywords arguments are passed to the RawDataset's `process()` method
         '''
-        dataset_list, _ = available_raw_datasets(keys_only=False)
-        if dataset_name not in dataset_list:
+        raw_datasets = _raw_dataset_registry(_raw_dataset_file())
+        if raw_datasets is not None and dataset_name not in raw_datasets:
             raise Exception(f'Unknown Dataset: {dataset_name}')
-        raw_ds = RawDataset.from_dict(dataset_list[dataset_name])
+        raw_ds = RawDataset.from_name(dataset_name)
+        if force is False:
+            process_kwargs = {k:v for k, v in kwargs.items()
+                              if k not in ['return_X_y', 'use_docstring']}
+            ds = raw_ds.load_cached(cache_path=cache_path, **process_kwargs)
+            if ds is not None:
+                if kwargs.get('return_X_y', False):
+                    return ds.data, ds.target
+                return ds
+
         raw_ds.fetch(fetch_path=fetch_path, force=force)
         raw_ds.unpack(unpack_path=unpack_path, force=force)
         ds = raw_ds.process(cache_path=cache_path, force=force, **kwargs)
@@ -271,6 +513,8 @@ class Dataset(Bunch):
         hash_type: {'sha1', 'md5', 'sha256'}
             Algorithm to use for hashing
         """
+        import joblib
+
         if exclude_list is None:
             exclude_list = ['metadata']
 
@@ -278,7 +522,8 @@ class Dataset(Bunch):
         for key, value in self.items():
             if key in exclude_list:
                 continue
-            ret[f"{key}_hash"] = joblib.hash(value, hash_name=hash_type)
+            # coerce_mmap: memory-mapped arrays hash the same as in-memory ones
+            ret[f"{key}_hash"] = joblib.hash(value, hash_name=hash_type, coerce_mmap=True)
         return ret
 
     def dump(self, file_base=None, dump_path=None, hash_type='sha1',
@@ -306,6 +551,8 @@ class Dataset(Bunch):
             If True, `dump_path` will be created (if necessary)
 
         """
+        import joblib
+
         if dump_path is None:
             dump_path = processed_data_path
         dump_path = pathlib.Path(dump_path)
@@ -340,17 +587,38 @@ class Dataset(Bunch):
         if create_dirs:
             os.makedirs(metadata_fq.parent, exist_ok=True)
 
+        # Files are replaced, not overwritten: this dataset (or another process)
+        # may have the existing files memory-mapped.
         if dump_metadata:
-            with open(metadata_fq, 'wb') as fo:
-                joblib.dump(metadata, fo)
+            _dump_replace(self['metadata'], metadata_fq)
             logger.debug(f'Wrote Dataset Metadata: {metadata_filename}')
 
         dataset_fq = dump_path / dataset_filename
-        with open(dataset_fq, 'wb') as fo:
-            joblib.dump(self, fo)
+        _dump_replace(self, dataset_fq)
         logger.debug(f'Wrote Dataset: {dataset_filename}')
 
 
+def _dump_replace(obj, filename):
+    """`joblib.dump` an object to a temporary file, then move it to `filename`
+
+    Replacing `filename` (rather than truncating and rewriting it) leaves any
+    existing memory maps of the old file intact, including ones held by the
+    object being dumped.
+    """
+    import joblib
+
+    tmp_fq = filename.with_name(f'{filename.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_fq, 'wb') as fo:
+            joblib.dump(obj, fo)
+        os.replace(tmp_fq, filename)
+    except BaseException:
+        try:
+            tmp_fq.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
 class RawDataset(object):
     """Representation of a raw dataset"""
 
@@ -486,12 +754,95 @@ class RawDataset(object):
         self.file_list.append(fetch_dict)
         self.fetched_ = False
 
+    @property
+    def state_file_(self):
+        """Location of the on-disk copy of the fetch/unpack state"""
+        return pathlib.Path(self.dataset_dir) / f'{self.name}.state'
+
+    @staticmethod
+    def _file_list_item_hash(item):
+        """Hash of a file_list entry, ignoring the (computed) hash_value"""
+        import joblib
+        return joblib.hash({k:v for k, v in item.items() if k != 'hash_value'})
+
+    def _save_state(self):
+        """Persist the fetch/unpack state, so other processes can skip these steps.
+
+        Each fetched file is recorded along with its size and modification time,
+        which are used to check that the state is still valid.
+        """
+        if not self.fetched_:
+            return
+        files = []
+        for item, filename in zip(self.file_list, self.fetched_files_):
+            stat = os.stat(filename)
+            files.append({
+                'item_hash': self._file_list_item_hash(item),
+                'path': str(filename),
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'hash_type': item.get('hash_type', 'sha1'),
+                'hash_value': item.get('hash_value', None),
+            })
+        state = {
+            'files': files,
+            'unpack_path': str(self.unpack_path_) if self.unpacked_ else None,
+        }
+        os.makedirs(self.state_file_.parent, exist_ok=True)
+        save_json(self.state_file_, state)
+
+    def _load_state(self):
+        """Restore the fetch/unpack state saved by another process (or session)
+
+        The state is only used if the file list is unchanged, and all fetched
+        files still have their recorded size and modification time.
+
+        Returns
+        -------
+        True if the state was restored
+        """
+        try:
+            state = load_json(self.state_file_)
+        except (FileNotFoundError, ValueError):
+            return False
+        files = state.get('files', [])
+        if len(files) != len(self.file_list):
+            return False
+        for item, record in zip(self.file_list, files):
+            if record['item_hash'] != self._file_list_item_hash(item):
+                return False
+            if item.get('hash_value', None) not in [None, record['hash_value']]:
+                return False
+            try:
+                stat = os.stat(record['path'])
+            except FileNotFoundError:
+                return False
+            if stat.st_size != record['size'] or stat.st_mtime != record['mtime']:
+                return False
+
+        for item, record in zip(self.file_list, files):
+            item['hash_value'] = record['hash_value']
+        self.fetched_files_ = [pathlib.Path(record['path']) for record in files]
+        self.fetched_ = True
+        unpack_path = state.get('unpack_path', None)
+        if unpack_path is not None and pathlib.Path(unpack_path).exists():
+            self.unpacked_ = True
+            self.unpack_path_ = pathlib.Path(unpack_path)
+        logger.debug(f'Restored fetch state for {self.name} from {self.state_file_.name}')
+        return True
+
     def fetch(self, fetch_path=None, force=False):
         """Fetch to raw_data_dir and check hashes
+
+        The fetch state is saved to disk. If it is still valid (the raw files
+        are unchanged), later calls (even from other processes) skip the fetch.
         """
         if self.fetched_ and force is False:
             logger.debug(f'Raw Dataset {self.name} is already fetched. Skipping')
             return
+        if force is False and self._load_state():
+            logger.debug(f'Raw Dataset {self.name} was fetched previously. Skipping')
+            return self.fetched_
 
         if fetch_path is None:
             fetch_path = self.dataset_dir
@@ -511,6 +862,9 @@ class RawDataset(object):
                     break
         else:
             self.fetched_ = True
+            self.unpacked_ = False
+            self.unpack_path_ = None
+            self._save_state()
 
         return self.fetched_
 
@@ -521,17 +875,19 @@ class RawDataset(object):
             logger.debug("unpack() called before fetch()")
             self.fetch()
 
-        if self.unpacked_ and force is False:
+        if unpack_path is not None:
+            unpack_path = pathlib.Path(unpack_path)
+
+        if self.unpacked_ and force is False and unpack_path in [None, self.unpack_path_]:
             logger.debug(f'Raw Dataset {self.name} is already unpacked. Skipping')
         else:
             if unpack_path is None:
                 unpack_path = interim_data_path / self.name
-            else:
-                unpack_path = pathlib.Path(unpack_path)
             for filename in self.fetched_files_:
                 unpack(filename, dst_dir=unpack_path)
             self.unpacked_ = True
             self.unpack_path_ = unpack_path
+            self._save_state()
 
         return self.unpack_path_
 
@@ -545,6 +901,7 @@ class RawDataset(object):
 
         This generated Dataset object is cached using joblib, so subsequent
         calls to process with the same file_list and kwargs should be fast.
+        The cache is pruned according to the limits set on `DatasetCache`.
 
         Parameters
         ----------
@@ -558,35 +915,37 @@ class RawDataset(object):
         use_docstring: boolean
             If True, the docstring of `self.load_function` is used as the Dataset DESCR text.
         """
-        if not self.unpacked_:
-            logger.debug("process() called before unpack()")
-            self.unpack()
-
         if cache_path is None:
             cache_path = interim_data_path
         else:
             cache_path = pathlib.Path(cache_path)
 
-        # If any of these things change, recreate and cache a new Dataset
-
-        meta_hash = self.to_hash(**kwargs)
-
         dset = None
         dset_opts = {}
         if force is False:
-            try:
-                dset = Dataset.load(meta_hash, data_path=cache_path)
-                logger.debug(f"Found cached Dataset for {self.name}: {meta_hash}")
-            except FileNotFoundError:
-                logger.debug(f"No cached Dataset found. Re-creating {self.name}")
+            dset = self.load_cached(cache_path=cache_path, **kwargs)
 
         if dset is None:
+            if not self.unpacked_:
+                logger.debug("process() called before unpack()")
+                self.unpack()
+
+            # If any of these things change, recreate and cache a new Dataset
+            meta_hash = self.cache_key(**kwargs)
+            cache = DatasetCache(cache_path=cache_path)
+            logger.debug(f"No cached Dataset found. Re-creating {self.name}")
             metadata = self.default_metadata(use_docstring=use_docstring)
             supplied_metadata = kwargs.pop('metadata', {})
             kwargs['metadata'] = {**metadata, **supplied_metadata}
             dset_opts = self.load_function(**kwargs)
             dset = Dataset(**dset_opts)
-            dset.dump(dump_path=cache_path, file_base=meta_hash)
+            cache.reserve(meta_hash)
+            try:
+                dset.dump(dump_path=cache_path, file_base=meta_hash)
+            except BaseException:
+                cache.evict(meta_hash)
+                raise
+            cache.add(meta_hash)
 
         if return_X_y:
             return dset.data, dset.target
@@ -594,6 +953,41 @@ class RawDataset(object):
         return dset
 
 
+    def load_cached(self, cache_path=None, **kwargs):
+        """Return the cached Dataset `process(**kwargs)` would produce, if any.
+
+        This never fetches or unpacks: if the raw files haven't been fetched
+        (in this process, or in a previous one whose saved state is still valid),
+        the cache key can't be computed, and None is returned.
+
+        Parameters
+        ----------
+        cache_path: path
+            Location of joblib cache.
+        kwargs:
+            options that would be passed to `process()`
+
+        Returns
+        -------
+        The cached Dataset, or None if no cached Dataset is available
+        """
+        if cache_path is None:
+            cache_path = interim_data_path
+        else:
+            cache_path = pathlib.Path(cache_path)
+
+        if not self.fetched_ and not self._load_state():
+            return None
+
+        meta_hash = self.cache_key(**kwargs)
+        try:
+            dset = Dataset.load(meta_hash, data_path=cache_path)
+        except FileNotFoundError:
+            return None
+        logger.debug(f"Found cached Dataset for {self.name}: {meta_hash}")
+        DatasetCache(cache_path=cache_path).touch(meta_hash)
+        return dset
+
     def default_metadata(self, use_docstring=False):
         """Returns default metadata derived from this RawDataset
 
@@ -650,6 +1044,8 @@ class RawDataset(object):
         kwargs:
             key/value pairs to add before hashing
         """
+        import joblib
+
         if ignore is None:
             ignore = ['dataset_dir']
         my_dict = {**self.to_dict(), **kwargs}
@@ -658,6 +1054,33 @@ class RawDataset(object):
 
         return joblib.hash(my_dict, hash_name=hash_type)
 
+    def cache_key(self, hash_type='sha1', **kwargs):
+        """Compute the key used to cache Datasets generated by `process()`
+
+        In addition to the fields hashed by `to_hash()`, the key covers:
+            * the verified hashes of the fetched raw files,
+            * a fingerprint of the `load_function` source code and module
+              (see `function_fingerprint`), and
+            * the version of this package.
+        so a cached Dataset is only reused if none of these have changed.
+        Fetches the raw files if they have not been fetched already.
+
+        hash_type: {'md5', 'sha1', 'sha256'}
+            Hash algorithm to use
+        kwargs:
+            key/value pairs to add before hashing (i.e. the `process()` options)
+        """
+        if not self.fetched_:
+            self.fetch()
+        file_hashes = [(get_dataset_filename(item), item.get('hash_type', None),
+                        item.get('hash_value', None))
+                       for item in self.file_list]
+        return self.to_hash(hash_type=hash_type,
+                            file_hashes=file_hashes,
+                            load_function_fingerprint=function_fingerprint(self.load_function),
+                            folklore_version=__version__,
+                            **kwargs)
+
     def __hash__(self):
         return hash(self.to_hash())
 
@@ -692,10 +1115,11 @@ class RawDataset(object):
             Name of json file containing key/dict map
 
         """
-        raw_datasets, _ = available_raw_datasets(raw_dataset_file=raw_dataset_file,
-                                                 raw_dataset_path=raw_dataset_path,
-                                                 keys_only=False)
-        return cls.from_dict(raw_datasets[raw_dataset_name])
+        raw_dataset_file_fq = _raw_dataset_file(raw_dataset_file, raw_dataset_path)
+        raw_datasets = _raw_dataset_registry(raw_dataset_file_fq)
+        if raw_datasets is None:
+            raise FileNotFoundError(f"No dataset file found: {raw_dataset_file}")
+        return cls.from_dict(copy.deepcopy(raw_datasets[raw_dataset_name]))
 
     @classmethod
     def from_dict(cls, obj_dict):
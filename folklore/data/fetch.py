@@ -6,7 +6,6 @@ import shutil
 import tarfile
 import zipfile
 import zlib
-import requests
 
 from ..paths import raw_data_path, interim_data_path
 from ..logging import logger
@@ -191,8 +190,7 @@ def fetch_file(url=None, contents=None,
         logger.debug(f'No file_name specified. Inferring {file_name} from URL')
     dl_data_path = pathlib.Path(dst_dir)
 
-    if not os.path.exists(dl_data_path):
-        os.makedirs(dl_data_path)
+    os.makedirs(dl_data_path, exist_ok=True)
 
     raw_data_file = dl_data_path / file_name
 
@@ -221,6 +219,7 @@ def fetch_file(url=None, contents=None,
         raise Exception(f"Cannot proceed: {file_name} not found on disk, and no fetch information (`url` or `contents`) specified.")
 
     if url is not None:
+        import requests
         # Download the file
         try:
             results = requests.get(url)
@@ -261,8 +260,7 @@ def unpack(filename, dst_dir=None, create_dst=True):
         dst_dir = interim_data_path
 
     if create_dst:
-        if not os.path.exists(dst_dir):
-            os.makedirs(dst_dir)
+        os.makedirs(dst_dir, exist_ok=True)
 
     # in case it is a Path
     path = str(filename)
@@ -6,10 +6,20 @@ from pathlib import Path
 from dotenv import find_dotenv, load_dotenv
 from .datasets import process_raw_datasets
 from ..logging import logger
+from ..utils import resolve_n_jobs
+
+def _check_jobs(ctx, param, value):
+    try:
+        resolve_n_jobs(value)
+    except ValueError as err:
+        raise click.BadParameter(str(err))
+    return value
 
 @click.command()
 @click.argument('action')
-def main(action, raw_datasets=None):
+@click.option('--jobs', '-j', type=int, default=1, callback=_check_jobs,
+              help='Number of raw datasets to work on in parallel (-1 for all CPUs)')
+def main(action, raw_datasets=None, *, jobs):
     """Fetch and/or process the raw data
 
     Raw files are downloaded into .paths.raw_data_path
@@ -19,7 +29,11 @@ def main(action, raw_datasets=None):
     action: {'fetch', 'unpack', 'process'}
 
     """
-    process_raw_datasets(raw_datasets=raw_datasets, action=action)
+    results = process_raw_datasets(raw_datasets=raw_datasets, action=action, n_jobs=jobs,
+                                   raise_errors=False)
+    failed = [name for name, result in results.items() if 'error' in result]
+    if failed:
+        raise click.ClickException(f"{action} failed for: {', '.join(failed)}")
 
 if __name__ == '__main__':
     # not used in this stub but often useful for finding various files
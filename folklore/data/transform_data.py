@@ -73,7 +73,8 @@ def del_transformer(index, transformer_path=None, transformer_file=None):
     save_json(transformer_file_fq, transformer_list)
 
 def add_transformer(from_raw=None, raw_dataset_opts=None,
-                    input_dataset=None, suppress_output=False, output_dataset=None,
+                    input_dataset=None, input_mmap_mode=None,
+                    suppress_output=False, output_dataset=None,
                     transformations=None,
                     transformer_path=None, transformer_file=None):
     """Create and add a dataset transformation pipeline to the workflow.
@@ -91,6 +92,9 @@ def add_transformer(from_raw=None, raw_dataset_opts=None,
         Name of a raw dataset.
         Specifying this option creates a dataset transformation pipeline that begins
         starts from a raw dataset with this namew
+    input_mmap_mode: {None, 'r', 'r+', 'c'}
+        If set, `input_dataset` is memory-mapped (using this mode) rather than
+        read into memory. Useful with the blocked `train_test_split` transformer.
     output_dataset: string
         Name to use when writing the terminal Dataset object to disk.
     raw_dataset_opts: dict
@@ -111,6 +115,8 @@ def add_transformer(from_raw=None, raw_dataset_opts=None,
         raise Exception('Cannot set both `from_raw` and `input_datset`')
     if from_raw is None and raw_dataset_opts is not None:
         raise Exception('Must specify `from_raw` when using `raw_dataset_opts`')
+    if input_dataset is None and input_mmap_mode is not None:
+        raise Exception('Must specify `input_dataset` when using `input_mmap_mode`')
 
     transformer_list, transformer_file_fq = get_transformer_list(transformer_path=transformer_path,
                                                                  transformer_file=transformer_file,
@@ -123,6 +129,8 @@ def add_transformer(from_raw=None, raw_dataset_opts=None,
             output_dataset = from_raw
     elif input_dataset:
         transformer['input_dataset'] = input_dataset
+        if input_mmap_mode is not None:
+            transformer['input_mmap_mode'] = input_mmap_mode
     else:
         raise Exception("Must specify one of from `from_raw` or `input_dataset`")
 
@@ -163,6 +171,7 @@ def apply_transforms(transformer_path=None, transformer_file='transformer_list.j
         raw_dataset_name = tdict.get('raw_dataset_name', None)
         output_dataset = tdict.get('output_dataset', None)
         input_dataset = tdict.get('input_dataset', None)
+        input_mmap_mode = tdict.get('input_mmap_mode', None)
         transformations = tdict.get('transformations', [])
         if raw_dataset_name is not None:
             if raw_dataset_name not in raw_datasets:
@@ -172,7 +181,7 @@ def apply_transforms(transformer_path=None, transformer_file='transformer_list.j
             ds = rds.process(**raw_dataset_opts)
         else:
             logger.debug("Loading Dataset: {input_dataset}")
-            ds = Dataset.load(input_dataset)
+            ds = Dataset.load(input_dataset, mmap_mode=input_mmap_mode)
 
         for tname, topts in transformations:
             tfunc = transformers.get(tname, None)
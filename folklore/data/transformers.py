@@ -1,7 +1,10 @@
 import sys
+import math
 import pathlib
 import os
-from sklearn.model_selection import train_test_split
+import tempfile
+import numpy as np
+from ..paths import processed_data_path
 from .datasets import Dataset
 from ..logging import logger
 
@@ -30,6 +33,7 @@ def available_transformers(keys_only=True):
     train_test_split    train_test_split_xform
     pivot               pivot
     index_to_date_time  index_to_date_time
+    kfold_split         split_dataset_kfold
     ============        ====================================
 
     Parameters
@@ -39,6 +43,7 @@ def available_transformers(keys_only=True):
     """
     _TRANSFORMERS = {
         "index_to_date_time": index_to_date_time,
+        "kfold_split": split_dataset_kfold,
         "pivot": pivot,
         "train_test_split": split_dataset_test_train,
     }
@@ -50,6 +55,7 @@ def available_transformers(keys_only=True):
 def split_dataset_test_train(dset,
                              dump_path=None, dump_metadata=True,
                              force=True, create_dirs=True,
+                             block_size=None,
                              **split_opts):
     """Transformer that performs a train/test split.
 
@@ -69,10 +75,23 @@ def split_dataset_test_train(dset,
         If True, overwrite any existing files
     create_dirs: boolean
         If True, `dump_path` will be created (if necessary)
+    block_size: int or None
+        If None, the split is done in memory by `train_test_split`.
+        Otherwise, split indices are computed once, and the train and test
+        outputs are assembled `block_size` rows at a time. See
+        `blocked_train_test_split` for details.
     **split_opts:
         Remaining options will be passed to `train_test_split`
+        (or `blocked_train_test_split` if `block_size` is set)
 
     """
+    if block_size is not None:
+        return blocked_train_test_split(dset, dump_path=dump_path,
+                                        dump_metadata=dump_metadata,
+                                        force=force, create_dirs=create_dirs,
+                                        block_size=block_size, **split_opts)
+    from sklearn.model_selection import train_test_split
+
     new_ds = {}
     for kind in ['train', 'test']:
         dset_name = f"{dset.name}_{kind}"
@@ -91,23 +110,382 @@ def split_dataset_test_train(dset,
     new_ds['test'].dump(force=force, dump_path=dump_path, dump_metadata=dump_metadata, create_dirs=create_dirs)
     return dset
 
-def pivot(dset, **pivot_opts):
+def train_test_indices(n_samples, test_size=None, train_size=None,
+                       random_state=None, shuffle=True, stratify=None):
+    """Compute train/test row indices without touching the data.
+
+    Sizes and shuffling follow the semantics of `train_test_split`.
+
+    Parameters
+    ----------
+    n_samples: int
+        Number of rows to split
+    test_size, train_size: float, int or None
+        As in `train_test_split`. If both are None, test_size is 0.25
+    random_state: int or None
+        Seed used for shuffling
+    shuffle: boolean
+        If False, the first rows are used for training and the remainder for test
+    stratify: array-like or None
+        If not None, labels to use for a stratified split
+
+    Returns
+    -------
+    (train_indices, test_indices)
+
+    Examples
+    --------
+    >>> train, test = train_test_indices(8, test_size=0.25, shuffle=False)
+    >>> train, test
+    (array([0, 1, 2, 3, 4, 5]), array([6, 7]))
+    >>> train, test = train_test_indices(8, test_size=2, random_state=0)
+    >>> sorted(np.concatenate([train, test]).tolist())
+    [0, 1, 2, 3, 4, 5, 6, 7]
+    """
+    if test_size is None and train_size is None:
+        test_size = 0.25
+    if isinstance(test_size, float):
+        n_test = math.ceil(test_size * n_samples)
+    elif test_size is not None:
+        n_test = int(test_size)
+    if isinstance(train_size, float):
+        n_train = math.floor(train_size * n_samples)
+    elif train_size is not None:
+        n_train = int(train_size)
+    if train_size is None:
+        n_train = n_samples - n_test
+    elif test_size is None:
+        n_test = n_samples - n_train
+    if n_train + n_test > n_samples or n_train <= 0 or n_test < 0:
+        raise Exception(f'Invalid split sizes: train={n_train}, test={n_test} '
+                        f'with {n_samples} samples')
+
+    if not shuffle:
+        if stratify is not None:
+            raise Exception('Stratified splits require `shuffle=True`')
+        return np.arange(n_train), np.arange(n_train, n_train + n_test)
+
+    if stratify is not None:
+        from sklearn.model_selection import StratifiedShuffleSplit
+        splitter = StratifiedShuffleSplit(n_splits=1, test_size=n_test,
+                                          train_size=n_train,
+                                          random_state=random_state)
+        return next(splitter.split(np.zeros(n_samples), stratify))
+
+    permutation = np.random.RandomState(random_state).permutation(n_samples)
+    return permutation[n_test:n_test + n_train], permutation[:n_test]
+
+def blocked_train_test_split(dset, block_size=100000,
+                             dump_path=None, dump_metadata=True,
+                             force=True, create_dirs=True,
+                             test_size=None, train_size=None,
+                             random_state=None, shuffle=True, stratify=False):
+    """Transformer: memory-bounded train/test split.
+
+    Behaves like `split_dataset_test_train`, but never holds a full copy of
+    the split data in memory. Split indices are computed once (from the
+    target alone, when stratifying), then rows are gathered `block_size`
+    at a time into on-disk arrays, which are streamed out by `Dataset.dump`.
+
+    For best results, load the input dataset with `mmap_mode='r'`
+    (e.g. by setting `input_mmap_mode` in the transformer pipeline),
+    so that the input is never read into memory in full either.
+
+    Parameters
+    ----------
+    block_size: int
+        Number of rows to gather at a time. Peak memory use is
+        roughly `block_size` rows of `dset.data`.
+    stratify: boolean
+        If True, perform a stratified split using `dset.target` as labels
+    test_size, train_size, random_state, shuffle:
+        As in `train_test_split`
+    dump_metadata, dump_path, force, create_dirs:
+        As in `split_dataset_test_train`
+
+    Returns
+    -------
+    `dset`, intact.
+    """
+    if dump_path is None:
+        dump_path = processed_data_path
+    dump_path = pathlib.Path(dump_path)
+    if create_dirs:
+        os.makedirs(dump_path, exist_ok=True)
+
+    data = dset.data
+    if not hasattr(data, 'dtype'):
+        raise Exception('Blocked splits require `data` to be a numpy array')
+    n_samples = data.shape[0]
+    block_size = int(block_size)
+
+    split_opts = {'test_size': test_size, 'train_size': train_size,
+                  'random_state': random_state, 'shuffle': shuffle,
+                  'stratify': stratify, 'block_size': block_size}
+    indices = {}
+    indices['train'], indices['test'] = train_test_indices(
+        n_samples, test_size=test_size, train_size=train_size,
+        random_state=random_state, shuffle=shuffle,
+        stratify=np.asarray(dset.target) if stratify else None)
+
+    with tempfile.TemporaryDirectory(dir=dump_path) as tmpdir:
+        for kind in ['train', 'test']:
+            idx = indices[kind]
+            dset_name = f"{dset.name}_{kind}"
+            dset_meta = {**dset.metadata, 'split':kind, 'split_opts':split_opts}
+            new_ds = Dataset(dataset_name=dset_name, metadata=dset_meta,
+                             update_hashes=False)
+
+            out = np.lib.format.open_memmap(pathlib.Path(tmpdir) / f'{kind}.npy',
+                                            mode='w+', dtype=data.dtype,
+                                            shape=(len(idx),) + data.shape[1:])
+            for start in range(0, len(idx), block_size):
+                stop = start + block_size
+                out[start:stop] = data[idx[start:stop]]
+            out.flush()
+
+            new_ds.data = out
+            if dset.target is not None:
+                new_ds.target = np.asarray(dset.target)[idx]
+            logger.info(f"Writing Transformed Dataset: {new_ds.name}")
+            new_ds.dump(force=force, dump_path=dump_path, dump_metadata=dump_metadata,
+                        create_dirs=create_dirs)
+            del new_ds, out
+    return dset
+
+def split_dataset_kfold(dset, n_splits=5, n_repeats=1,
+                        shuffle=False, random_state=None, stratify=False,
+                        dump_path=None, dump_metadata=True,
+                        force=True, create_dirs=True):
+    """Transformer that performs a (repeated) k-fold cross-validation split.
+
+    This transformer passes `dset` intact. As a side effect, it dumps `dset`
+    once (as the shared base dataset), along with a compact view for each
+    fold: {dset.name}_fold{k}_train and {dset.name}_fold{k}_test.
+    Views store only row indices, and are resolved against the base
+    dataset by `Dataset.load`.
+
+    If `dump_path` already holds `dset` (a dataset of the same name, whose
+    data and target hashes match), it is used as the base dataset as-is,
+    rather than written again.
+
+    Folds are numbered from 0 to n_splits * n_repeats - 1.
+
+    Parameters
+    ----------
+    n_splits: int
+        Number of folds
+    n_repeats: int
+        Number of times to repeat the k-fold split (with different shuffling)
+    shuffle: boolean
+        Whether to shuffle the rows before splitting. Always True if n_repeats > 1
+    random_state: int or None
+        Seed used for shuffling
+    stratify: boolean
+        If True, preserve the class proportions of `dset.target` in each fold
+    dump_metadata: boolean
+        If True, also dump a standalone copy of the base dataset metadata.
+    dump_path: path. (default: `processed_data_path`)
+        Directory where data will be dumped.
+    force: boolean
+        If False, raise an exception if any dump files already exists
+        If True, overwrite any existing files
+    create_dirs: boolean
+        If True, `dump_path` will be created (if necessary)
+    """
+    from sklearn.model_selection import (KFold, StratifiedKFold, RepeatedKFold,
+                                         RepeatedStratifiedKFold)
+
+    if n_repeats > 1:
+        if stratify:
+            splitter = RepeatedStratifiedKFold(n_splits=n_splits, n_repeats=n_repeats,
+                                               random_state=random_state)
+        else:
+            splitter = RepeatedKFold(n_splits=n_splits, n_repeats=n_repeats,
+                                     random_state=random_state)
+    else:
+        split_class = StratifiedKFold if stratify else KFold
+        splitter = split_class(n_splits=n_splits, shuffle=shuffle,
+                               random_state=random_state if shuffle else None)
+    split_opts = {'n_splits': n_splits, 'n_repeats': n_repeats, 'shuffle': shuffle,
+                  'random_state': random_state, 'stratify': stratify}
+
+    if dump_path is None:
+        dump_path = processed_data_path
+    dump_path = pathlib.Path(dump_path)
+    hash_type = dset.metadata.get('hash_type', 'sha1')
+    data_hashes = dset.get_data_hashes(hash_type=hash_type)
+    try:
+        saved_meta = Dataset.load(dset.name, data_path=dump_path, metadata_only=True)
+    except FileNotFoundError:
+        saved_meta = None
+    if ((dump_path / f'{dset.name}.dataset').exists() and saved_meta is not None and
+            all(saved_meta.get(k, None) == v for k, v in data_hashes.items())):
+        logger.info(f"Using existing Base Dataset: {dset.name}")
+        dset['metadata'] = {**dset.metadata, **data_hashes}
+    else:
+        logger.info(f"Writing Base Dataset: {dset.name}")
+        dset.dump(force=force, dump_path=dump_path, dump_metadata=dump_metadata,
+                  create_dirs=create_dirs, hash_type=hash_type)
+
+    n_samples = len(dset.data)
+    labels = np.asarray(dset.target) if stratify else None
+    for fold, (train_idx, test_idx) in enumerate(splitter.split(np.zeros(n_samples), labels)):
+        for kind, idx in [('train', train_idx), ('test', test_idx)]:
+            view_name = f"{dset.name}_fold{fold}_{kind}"
+            logger.debug(f"Writing Dataset View: {view_name}")
+            dset.dump_view(idx, file_base=view_name, dump_path=dump_path,
+                           force=force, create_dirs=create_dirs,
+                           split=kind, fold=fold, split_opts=split_opts)
+    return dset
+
+_FAST_PIVOT_AGGFUNCS = ['count', 'mean', 'sum']
+
+def fast_pivot_supported(df, index=None, columns=None, values=None, aggfunc='mean',
+                         fill_value=None, margins=False, dropna=True, **pivot_opts):
+    """Check whether `fast_pivot` can be used in place of `DataFrame.pivot_table`
+
+    The fast path covers the common case: a single `index` column, a single
+    `columns` column and a single int64 or float64 `values` column, with no
+    missing values, aggregated by one of 'sum', 'mean', or 'count'. (For
+    other value dtypes, `pivot_table` returns results in the dtype of the
+    values, e.g. float32 means, which the fast path doesn't reproduce.)
+
+    Parameters
+    ----------
+    df: DataFrame
+    index, columns, values, aggfunc, fill_value, margins, dropna, **pivot_opts:
+        options that would be passed to `DataFrame.pivot_table`
+
+    Returns
+    -------
+    True if `fast_pivot(df, index, columns, values, aggfunc)` gives the same
+    result as `df.pivot_table(...)`
+    """
+    if pivot_opts or margins or fill_value is not None or not dropna:
+        return False
+    if not isinstance(aggfunc, str) or aggfunc not in _FAST_PIVOT_AGGFUNCS:
+        return False
+    keys = [index, columns, values]
+    if any(not isinstance(k, str) or k not in df.columns for k in keys):
+        return False
+    if index == columns:
+        return False
+    import pandas as pd
+    for key in [index, columns]:
+        if isinstance(df[key].dtype, pd.CategoricalDtype):
+            return False
+    if df[values].dtype not in [np.int64, np.float64]:
+        return False
+    return not df[keys].isna().any().any()
+
+def fast_pivot(df, index, columns, values, aggfunc='mean'):
+    """Vectorized equivalent of `df.pivot_table(index, columns, values, aggfunc)`
+
+    Rows and columns are factorized to integer codes, and the aggregation is
+    done with a single `np.bincount` over the flattened (row, column) cells.
+    Only the cases accepted by `fast_pivot_supported` are handled.
+
+    Examples
+    --------
+    >>> import pandas as pd
+    >>> df = pd.DataFrame({'day': [2, 1, 1, 2, 2], 'item': ['b', 'a', 'b', 'a', 'a'],
+    ...                    'qty': [1, 2, 3, 4, 5]})
+    >>> fast_pivot(df, index='day', columns='item', values='qty', aggfunc='sum').values
+    array([[2, 3],
+           [9, 1]])
+    >>> opts = dict(index='day', columns='item', values='qty', aggfunc='mean')
+    >>> fast_pivot(df, **opts).equals(df.pivot_table(**opts))
+    True
+    """
+    import pandas as pd
+
+    row_codes, row_labels = pd.factorize(df[index], sort=True)
+    col_codes, col_labels = pd.factorize(df[columns], sort=True)
+    n_rows, n_cols = len(row_labels), len(col_labels)
+    cells = row_codes.astype(np.int64) * n_cols + col_codes
+    counts = np.bincount(cells, minlength=n_rows * n_cols)
+    observed = counts > 0
+
+    if aggfunc == 'count':
+        result = counts
+    else:
+        vals = df[values].to_numpy()
+        if aggfunc == 'sum' and np.issubdtype(vals.dtype, np.integer):
+            # bincount weights are float64; accumulate integers exactly
+            result = np.zeros(n_rows * n_cols, dtype=np.int64)
+            np.add.at(result, cells, vals)
+        else:
+            result = np.bincount(cells, weights=vals, minlength=n_rows * n_cols)
+        if aggfunc == 'mean':
+            result = result / np.where(observed, counts, 1)
+
+    if not observed.all():
+        result = np.where(observed, result, np.nan)
+
+    pivoted = pd.DataFrame(result.reshape(n_rows, n_cols),
+                           index=pd.Index(row_labels, name=index),
+                           columns=pd.Index(col_labels, name=columns))
+    return pivoted
+
+def pivot(dset, engine='auto', **pivot_opts):
     """Pivot data stored as a Pandas Dataframe
 
+    engine: {'auto', 'fast', 'pandas'}
+        'pandas' always uses `DataFrame.pivot_table`.
+        'fast' uses the vectorized `fast_pivot`, and raises an exception if
+        `pivot_opts` are not supported by it (see `fast_pivot_supported`).
+        'auto' uses `fast_pivot` if possible, falling back to `pivot_table`.
     pivot_opts:
         keyword arguments passed to pandas.Dataframe.pivot_table
     """
-    pivoted = dset.data.pivot_table(**pivot_opts)
-    ds_pivot = Dataset(name=f"{dset.name}_pivoted", metadata=dset.metadata, data=pivoted, target=None)
-    ds_pivot.metadata['pivot_opts'] = pivot_opts
+    if engine not in ['auto', 'fast', 'pandas']:
+        raise Exception(f"Unknown pivot engine: {engine}")
+
+    use_fast = engine != 'pandas' and fast_pivot_supported(dset.data, **pivot_opts)
+    if engine == 'fast' and not use_fast:
+        raise Exception(f"pivot options not supported by the fast engine: {pivot_opts}")
+
+    if use_fast:
+        logger.debug(f"Using fast pivot engine on {dset.name}")
+        pivoted = fast_pivot(dset.data, index=pivot_opts['index'],
+                             columns=pivot_opts['columns'],
+                             values=pivot_opts['values'],
+                             aggfunc=pivot_opts.get('aggfunc', 'mean'))
+    else:
+        pivoted = dset.data.pivot_table(**pivot_opts)
+    metadata = {**dset.metadata, 'pivot_opts': pivot_opts}
+    ds_pivot = Dataset(dataset_name=f"{dset.name}_pivoted", metadata=metadata,
+                       data=pivoted, target=None)
 
     return ds_pivot
 
-def index_to_date_time(dset, suffix='dt'):
-    """Transformer: Extract a datetime index into Date and Time columns"""
-    df = dset.data.copy()
-    df['Time']=df.index.time
-    df['Date']=df.index.date
+def index_to_date_time(dset, suffix='dt', compact=False, copy=True):
+    """Transformer: Extract a datetime index into Date and Time columns
+
+    suffix: string
+        The new dataset is named {dset.name}_{suffix}
+    compact: boolean
+        If False, `Date` and `Time` are columns of python `datetime.date`
+        and `datetime.time` objects.
+        If True, they are typed numpy columns instead: `Date` is a datetime64
+        column (the timestamp at midnight) and `Time` is a timedelta64 column
+        (the time since midnight). These are much faster to build, smaller
+        in memory, and faster to dump.
+    copy: boolean
+        If False, `dset.data` is modified in place rather than copied.
+    """
+    if copy:
+        df = dset.data.copy()
+    else:
+        df = dset.data
+    if compact:
+        dates = df.index.normalize()
+        df['Time'] = df.index - dates
+        df['Date'] = dates
+    else:
+        df['Time'] = df.index.time
+        df['Date'] = df.index.date
     df.reset_index(inplace=True, drop=True)
-    new_ds = Dataset(dataset_name=f"{dset.name}_{suffix}", metadata=dset.metadata, data=df)
+    new_ds = Dataset(dataset_name=f"{dset.name}_{suffix}", metadata=dict(dset.metadata), data=df)
     return new_ds
@@ -1,17 +1,20 @@
+import hashlib
 import importlib
+import inspect
 import os
 import pathlib
-import random
 import sys
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from functools import partial
-from joblib import func_inspect as jfi
 
 from ..logging import logger
+from ..utils import line_partitions, resolve_n_jobs
 
 __all__ = [
     'deserialize_partial',
+    'function_fingerprint',
+    'LabelNormalizer',
     'normalize_labels',
     'partial_call_signature',
     'read_space_delimited',
@@ -22,7 +25,23 @@ __all__ = [
 _MODULE = sys.modules[__name__]
 _MODULE_DIR = pathlib.Path(os.path.dirname(os.path.abspath(__file__)))
 
-def read_space_delimited(filename, skiprows=None, class_labels=True):
+def _split_data_target(df, class_labels=True, categorical_target=False):
+    """Split a DataFrame read by `read_space_delimited` into (data, target)"""
+    if class_labels is True:
+        target = df.iloc[:, -1]
+        if categorical_target:
+            target = target.astype('category').array
+        else:
+            target = target.to_numpy()
+        data = df.iloc[:, :-1].to_numpy()
+    else:
+        data = df.to_numpy()
+        target = np.zeros(data.shape[0])
+    return data, target
+
+def read_space_delimited(filename, skiprows=None, class_labels=True,
+                         dtype=str, engine=None, usecols=None, nrows=None,
+                         categorical_target=False, chunksize=None):
     """Read an space-delimited file
 
     skiprows: list of rows to skip when reading the file.
@@ -31,21 +50,64 @@ def read_space_delimited(filename, skiprows=None, class_labels=True):
     `#` characters are also used as data labels.
     class_labels: boolean
         if true, the last column is treated as the class label
+    dtype: type, dict, or None
+        Type of the columns. By default, everything is read as a string.
+        If None, column types are inferred, so numeric columns produce a
+        numeric `data` array.
+    engine: {None, 'c', 'pyarrow', 'python'}
+        Parser engine passed to `pandas.read_csv`. 'pyarrow' is usually
+        fastest, but does not support `nrows`, `chunksize` or a list of `skiprows`.
+    usecols: list or None
+        Only read these columns (by position). With `class_labels`, the last
+        of these is used as the class label.
+    nrows: int or None
+        Only read this many rows
+    categorical_target: boolean
+        If True, `target` is returned as a pandas Categorical (integer codes
+        plus a table of labels), rather than an array of labels
+    chunksize: int or None
+        If set, return an iterator over (data, target) tuples of (at most)
+        `chunksize` rows each, rather than reading the whole file at once.
+
+    Returns
+    -------
+    (data, target), or an iterator of (data, target) if `chunksize` is set
+
+    Examples
+    --------
+    >>> import io
+    >>> data, target = read_space_delimited(io.StringIO('1 2 a\\n3 4 b\\n'), dtype=None)
+    >>> data
+    array([[1, 2],
+           [3, 4]])
+    >>> type(target).__name__, list(target)
+    ('ndarray', ['a', 'b'])
+    >>> _, target = read_space_delimited(io.StringIO('1 2 a\\n3 4 b\\n'), categorical_target=True)
+    >>> type(target).__name__, list(target.categories)
+    ('Categorical', ['a', 'b'])
     """
-    with open(filename, 'r') as fd:
-        df = pd.read_table(fd, skiprows=skiprows, skip_blank_lines=True, comment=None, header=None, sep=' ', dtype=str)
-        # targets are last column. Data is everything else
-        if class_labels is True:
-            target = df.loc[:, df.columns[-1]].values
-            data = df.loc[:, df.columns[:-1]].values
-        else:
-            data = df.values
-            target = np.zeros(data.shape[0])
-        return data, target
+    import pandas as pd
+
+    read_opts = {'skiprows': skiprows, 'dtype': dtype, 'engine': engine,
+                 'usecols': usecols, 'nrows': nrows, 'chunksize': chunksize}
+    # only pass non-default options; some engines reject any use of the others
+    read_opts = {k:v for k, v in read_opts.items() if v is not None}
+    reader = pd.read_csv(filename, header=None, sep=' ', **read_opts)
+
+    if chunksize is not None:
+        return (_split_data_target(chunk, class_labels=class_labels,
+                                   categorical_target=categorical_target)
+                for chunk in reader)
+    return _split_data_target(reader, class_labels=class_labels,
+                              categorical_target=categorical_target)
 
 def normalize_labels(target):
     """Map an arbitary target vector to an integer vector
 
+    Labels are numbered in sorted order. To apply the same mapping to other
+    data (e.g. a test set), or to build it up a chunk at a time,
+    use a `LabelNormalizer`.
+
     Returns
     -------
     tuple: (mapped_target, label_map)
@@ -65,16 +127,100 @@ def normalize_labels(target):
 
     >>> all(np.vectorize(label_map.get)(mapped_target) == target)
     True
+
+    Missing labels (NaN) are a class of their own, numbered last
+
+    >>> mapped_target, label_map = normalize_labels(np.array([2.0, np.nan, 1.0, np.nan]))
+    >>> mapped_target
+    array([1, 2, 0, 2])
+    >>> bool(np.isnan(label_map[2]))
+    True
     """
-    label_map = {k:v for k, v in enumerate(np.unique(target))}
-    label_map_inv = {v:k for k, v in label_map.items()}
-    mapped_target = np.vectorize(label_map_inv.get)(target)
+    import pandas as pd
+
+    # use_na_sentinel=False: NaN gets a code (and label) like any other value
+    codes, labels = pd.factorize(np.ravel(target), sort=True, use_na_sentinel=False)
+    mapped_target = codes.reshape(np.shape(target))
+    label_map = dict(enumerate(labels))
 
     return mapped_target, label_map
 
+class LabelNormalizer(object):
+    """Reusable mapping from arbitrary labels to integers.
+
+    `fit` numbers labels in sorted order (like `normalize_labels`).
+    `partial_fit` can be called on successive chunks of a target: labels
+    already seen keep their integers, and new labels are appended (in sorted order),
+    so the mapping is stable across chunks.
+
+    Examples
+    --------
+    >>> ln = LabelNormalizer().fit(np.array(['b', 'a', 'b']))
+    >>> ln.transform(np.array(['a', 'b']))
+    array([0, 1])
+    >>> ln = ln.partial_fit(np.array(['c', 'a']))
+    >>> ln.transform(np.array(['c', 'b', 'a']))
+    array([2, 1, 0])
+    >>> ln.inverse_transform([2, 0]).tolist()
+    ['c', 'a']
+    >>> ln.label_map
+    {0: 'a', 1: 'b', 2: 'c'}
+    """
+    def __init__(self):
+        # sklearn-style attributes. Set by fit() / partial_fit()
+        self.classes_ = None
+        self._index = None
+
+    def fit(self, target):
+        """Create a new mapping from the labels in `target`"""
+        self.classes_ = None
+        self._index = None
+        return self.partial_fit(target)
+
+    def partial_fit(self, target):
+        """Add any previously unseen labels in `target` to the mapping"""
+        import pandas as pd
+
+        labels = pd.unique(np.ravel(target))
+        if self.classes_ is not None:
+            labels = labels[self._index.get_indexer(labels) == -1]
+        new_labels = np.sort(labels)
+        if self.classes_ is None:
+            self.classes_ = new_labels
+        elif len(new_labels):
+            self.classes_ = np.concatenate([self.classes_, new_labels])
+        self._index = pd.Index(self.classes_)
+        return self
+
+    def transform(self, target):
+        """Map labels to integers. Raises ValueError on unknown labels."""
+        if self._index is None:
+            raise ValueError('LabelNormalizer must be fit before calling transform()')
+        codes = self._index.get_indexer(np.ravel(target))
+        if (codes == -1).any():
+            import pandas as pd
+            unknown = pd.unique(np.ravel(target)[codes == -1])
+            raise ValueError(f'Unknown labels: {list(unknown)}')
+        return codes.reshape(np.shape(target))
+
+    def fit_transform(self, target):
+        """Equivalent to `fit(target).transform(target)`"""
+        return self.fit(target).transform(target)
+
+    def inverse_transform(self, mapped_target):
+        """Map integers back to the original labels"""
+        return self.classes_[np.asarray(mapped_target)]
+
+    @property
+    def label_map(self):
+        """dict mapping integers to labels (as returned by `normalize_labels`)"""
+        return dict(enumerate(self.classes_.tolist()))
+
 def partial_call_signature(func):
     """Return the fully qualified call signature for a (partial) function
     """
+    from joblib import func_inspect as jfi
+
     func = partial(func)
     fa = jfi.getfullargspec(func)
     default_kw = {}
@@ -86,6 +232,61 @@ def partial_call_signature(func):
         fq_keywords = default_kw
     return jfi.format_signature(func.func, *func.args, **fq_keywords)
 
+def _module_source(obj):
+    """Source code (as bytes) of the module defining `obj`, or None if unavailable"""
+    try:
+        source_file = inspect.getsourcefile(inspect.getmodule(obj))
+    except TypeError:  # built-in module
+        return None
+    if source_file is None:
+        return None
+    try:
+        with open(source_file, 'rb') as fd:
+            return fd.read()
+    except OSError:
+        return None
+
+def function_fingerprint(func, hash_type='sha1'):
+    """Compute a fingerprint of the code behind a (partial) function
+
+    The fingerprint covers the function's module, name, and the source code
+    of the whole module it is defined in, so it changes whenever the function,
+    or any helper in the same module, is edited. If the module's source is
+    unavailable, the function's own source (or bytecode) is used instead.
+    Partial arguments are not included.
+
+    For a callable instance (rather than a function), the fingerprint covers
+    its class (as above), and its state (as hashed by `joblib.hash`).
+
+    hash_type: {'md5', 'sha1', 'sha256'}
+        Hash algorithm to use
+
+    Returns
+    -------
+    hex digest string
+    """
+    import joblib
+    from joblib import func_inspect as jfi
+
+    func = partial(func).func
+    parts = []
+    if not inspect.isroutine(func) and not inspect.isclass(func):
+        parts.append(joblib.hash(func))
+        func = type(func)
+    module, name = jfi.get_func_name(func)
+    code = _module_source(func)
+    if code is None:
+        try:
+            code = inspect.getsource(func).encode('utf-8')
+        except (OSError, TypeError):
+            code_obj = getattr(func, '__code__', None)
+            code = code_obj.co_code if code_obj is not None else name.encode('utf-8')
+    hashval = hashlib.new(hash_type)
+    for part in [".".join(module), name] + parts:
+        hashval.update(part.encode('utf-8'))
+    hashval.update(code)
+    return hashval.hexdigest()
+
 def process_dataset_default(**kwargs):
     """Placeholder for data processing function"""
     logger.warning(f"Default `load_function` method. No `data` or `target` generated")
@@ -114,15 +315,33 @@ def deserialize_partial(func_dict, delete_keys=False):
         base_name = func_dict.get("load_function_name", 'process_dataset_default')
         func_mod_name = func_dict.get('load_function_module', None)
 
-    fail_func = partial(process_dataset_default, dataset_name=base_name)
+    func_name = _resolve_function(func_mod_name, base_name)
+    if func_name is None:
+        func_name = partial(process_dataset_default, dataset_name=base_name)
+    func = partial(func_name, *args, **kwargs)
+
+    return func
+
+# Functions found by `_resolve_function`, keyed by (module name, function name)
+_RESOLVED_FUNCTIONS = {}
 
+def _resolve_function(func_mod_name, base_name):
+    """Look up (and memoize) a function by module and name. None if not found.
+
+    Only successful lookups are memoized, so a function defined after a
+    failed lookup is found the next time.
+    """
+    key = (func_mod_name, base_name)
+    func = _RESOLVED_FUNCTIONS.get(key, None)
+    if func is not None:
+        return func
     if func_mod_name:
         func_mod = importlib.import_module(func_mod_name)
     else:
         func_mod = _MODULE
-    func_name = getattr(func_mod, base_name, fail_func)
-    func = partial(func_name, *args, **kwargs)
-
+    func = getattr(func_mod, base_name, None)
+    if func is not None:
+        _RESOLVED_FUNCTIONS[key] = func
     return func
 
 def serialize_partial(func):
@@ -140,6 +359,7 @@ def serialize_partial(func):
         load_function_args: args to pass to function
         load_function_kwargs: kwargs to pass to function
     """
+    from joblib import func_inspect as jfi
 
     func = partial(func)
     entry = {}
@@ -149,9 +369,95 @@ def serialize_partial(func):
     entry['load_function_kwargs'] = func.keywords
     return entry
 
-def reservoir_sample(filename, n_samples=1, random_seed=None):
+def iter_line_blocks(fd, start=0, stop=None, block_size=2**20):
+    """Iterate over a binary file in blocks of whole lines
+
+    Parameters
+    ----------
+    fd: binary file object
+    start, stop: int
+        byte range to read. `start` should be the beginning of a line.
+        Lines beginning before `stop` are included.
+    block_size: int
+        approximate size of each block, in bytes
+
+    Yields
+    ------
+    bytes objects, each containing one or more complete, newline-terminated lines.
+    """
+    fd.seek(start)
+    position = start
+    carry = b''
+    while stop is None or position < stop:
+        read_size = block_size if stop is None else min(block_size, stop - position)
+        block = fd.read(read_size)
+        if not block:
+            break
+        position += len(block)
+        block = carry + block
+        cut = block.rfind(b'\n') + 1
+        if cut == 0:
+            carry = block
+            continue
+        carry = block[cut:]
+        yield block[:cut]
+    if stop is not None and carry and not carry.endswith(b'\n'):
+        # finish a line that straddles `stop`
+        carry += fd.readline()
+    if carry:
+        yield carry if carry.endswith(b'\n') else carry + b'\n'
+
+def _reservoir_sample_range(filename, start, stop, n_samples, seed, block_size):
+    """Reservoir sample (Algorithm L) the lines beginning in a byte range of a file
+
+    Most lines are only counted (in C, via `bytes.count`); a line is only
+    located and copied if it is selected for the reservoir.
+
+    Returns
+    -------
+    (reservoir, n_lines), where reservoir is a list of (at most `n_samples`)
+    lines as bytes, and n_lines is the number of lines in the range.
+    """
+    rng = np.random.default_rng(seed)
+    reservoir = []
+    n_seen = 0
+    next_pick = None
+    weight = None
+    with open(filename, 'rb') as fd:
+        for block in iter_line_blocks(fd, start=start, stop=stop, block_size=block_size):
+            block_end = n_seen + block.count(b'\n')
+            picks = []  # (line number within the block, reservoir slot)
+            for line in range(n_seen, min(n_samples, block_end)):
+                picks.append((line - n_seen, line))
+            if next_pick is None and block_end >= n_samples:
+                weight = np.exp(np.log(1.0 - rng.random()) / n_samples)
+                next_pick = n_samples - 1
+                next_pick += int(np.log(1.0 - rng.random()) // np.log1p(-weight)) + 1
+            while next_pick is not None and next_pick < block_end:
+                picks.append((next_pick - n_seen, int(rng.integers(n_samples))))
+                weight *= np.exp(np.log(1.0 - rng.random()) / n_samples)
+                next_pick += int(np.log(1.0 - rng.random()) // np.log1p(-weight)) + 1
+            if picks:
+                line_ends = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+                for line, slot in picks:
+                    line_start = line_ends[line - 1] + 1 if line > 0 else 0
+                    sample = block[line_start:line_ends[line]]
+                    if slot == len(reservoir):
+                        reservoir.append(sample)
+                    else:
+                        reservoir[slot] = sample
+            n_seen = block_end
+    return reservoir, n_seen
+
+def reservoir_sample(filename, n_samples=1, random_seed=None, n_jobs=1,
+                     block_size=2**20, encoding='utf-8'):
     """Return a random subset of lines from a file
 
+    The file is scanned in binary blocks, and sampled using Algorithm L,
+    which only needs to decode the lines that are selected. Sampling uses
+    a private random number generator, so it is reproducible for a given
+    `random_seed` (and `n_jobs`), and doesn't affect the global random state.
+
     Parameters
     ----------
     filename: path
@@ -160,16 +466,40 @@ def reservoir_sample(filename, n_samples=1, random_seed=None):
         number of lines to return
     random_seed: int or None
         If set, use this as the random seed
+    n_jobs: int
+        If greater than 1, the file is split into `n_jobs` line-aligned byte
+        ranges, which are sampled in parallel processes. The resulting
+        reservoirs are merged into a uniform sample of the whole file.
+        If -1, use all CPUs.
+    block_size: int
+        size of blocks to read, in bytes
+    encoding: string
+        encoding used to decode the sampled lines
     """
-    if random_seed is not None:
-        random.seed(random_seed)
-    sample = []
-    with open(filename) as f:
-        for n, line in enumerate(f):
-            if n < n_samples:
-                sample.append(line.rstrip())
-            else:
-                r = random.randint(0, n_samples)
-                if r < n_samples:
-                    sample[r] = line.rstrip()
-    return sample
+    n_jobs = resolve_n_jobs(n_jobs)
+    if n_samples < 1:
+        return []
+    seeds = np.random.SeedSequence(random_seed).spawn(n_jobs + 1)
+    ranges = line_partitions(filename, n_jobs, by='bytes')
+
+    if n_jobs == 1:
+        (start, stop), = ranges
+        sample, _ = _reservoir_sample_range(filename, start, stop, n_samples,
+                                            seeds[0], block_size)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(_reservoir_sample_range, str(filename), start, stop,
+                                       n_samples, seed, block_size)
+                       for (start, stop), seed in zip(ranges, seeds)]
+            results = [future.result() for future in futures]
+        # choose how many lines to take from each range, as if sampling
+        # without replacement from the whole file, then subsample each reservoir
+        rng = np.random.default_rng(seeds[-1])
+        counts = [n_lines for _, n_lines in results]
+        takes = rng.multivariate_hypergeometric(counts, min(n_samples, sum(counts)))
+        sample = []
+        for (reservoir, _), take in zip(results, takes):
+            for i in rng.choice(len(reservoir), size=take, replace=False):
+                sample.append(reservoir[i])
+
+    return [line.decode(encoding).rstrip() for line in sample]
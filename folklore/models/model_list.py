@@ -1,11 +1,16 @@
+import hashlib
+import json
 import logging
+import os
 import pathlib
-from ..utils import load_json, save_json
+from ..utils import load_json, save_json, profile_phase, resolve_n_jobs
 from ..paths import model_path, trained_model_path
-from ..data import available_datasets
+from ..data import Dataset, available_datasets
 from .algorithms import available_algorithms
 from ..logging import logger
-from .train import train_model, save_model, load_model
+from .sweep import expand_sweep, load_sweep_record, select_candidates, sweep_fingerprint
+from .train import (ModelNotUpdatable, dataset_hashes, train_model, update_model,
+                    save_model, load_model)
 
 __all__ =[
     'get_model_list',
@@ -13,6 +18,9 @@ __all__ =[
     'add_model',
     'build_models',
     'available_models',
+    'describe_plan',
+    'plan_models',
+    'summarize_profiles',
 ]
 
 def get_model_list(model_dir=None, model_file=None, include_filename=False):
@@ -72,7 +80,9 @@ def add_model(dataset_name=None,
               algorithm_name=None,
               algorithm_params=None,
               model_dir=None, model_file=None,
-              run_number=1, force=False):
+              run_number=1, force=False,
+              param_grid=None, param_distributions=None, n_iter=10,
+              random_state=0, halving=None, training_options=None):
     """Create and add a dataset transformation pipeline to the workflow.
 
     Model pipelines apply a sequence of model functions to a Dataset (or RawDataset),
@@ -95,6 +105,20 @@ def add_model(dataset_name=None,
         Location of `model_file`
     model_file: string, default 'model_list.json'
         Name of json file that contains the model pipeline
+    param_grid: dict, list of dicts, or None
+        If given, add a sweep over every combination of these parameter
+        values (in addition to the fixed `algorithm_params`)
+    param_distributions: dict or None
+        If given, add a sweep over `n_iter` parameter settings sampled
+        (using `random_state`) from these values or distributions
+    halving: dict or None
+        If given, select the sweep's most promising settings by successive
+        halving, and only train those in full.
+    training_options: dict or None
+        out-of-core training options passed to `train_model`,
+        e.g. `{'block_size': 100000, 'shuffle': True}`
+
+    See `folklore.models.sweep` for details of sweeps.
     """
     model_list, model_file_fq = get_model_list(model_dir=model_dir,
                                                model_file=model_file,
@@ -111,6 +135,20 @@ def add_model(dataset_name=None,
         'algorithm_params': algorithm_params,
         'run_number': run_number
     }
+    if param_grid is not None:
+        model['param_grid'] = param_grid
+    if param_distributions is not None:
+        model['param_distributions'] = param_distributions
+        model['n_iter'] = n_iter
+        model['random_state'] = random_state
+    if halving is not None:
+        model['halving'] = halving
+    if training_options is not None:
+        unknown = set(training_options) - set(_TRAINING_OPTIONS)
+        if unknown:
+            raise Exception(f'Unknown training options: {sorted(unknown)}')
+        model.update(training_options)
+    expand_sweep(model)  # check the sweep is valid
     if (model in model_list) and not force:
         logger.warning(f"model: {model} is already in the model list." +
                        "Skipping. To force an addition, set force=True")
@@ -118,11 +156,377 @@ def add_model(dataset_name=None,
         model_list.append(model)
     save_json(model_file_fq, model_list)
 
-def build_models(model_file='model_list.json', model_dir=None, hash_type='sha1'):
+# Model list options (passed to `train_model`) that change the trained model
+_TRAINING_OPTIONS = ['block_size', 'n_epochs', 'shuffle', 'shuffle_seed']
+
+def _training_fingerprint(td, dataset_metadata, hash_type):
+    """Fingerprint of everything that goes into training a model
+
+    Covers the dataset contents (via the hashes recorded in its metadata:
+    `data_hash` and `target_hash`, or for a view, those of its base dataset
+    plus `indices_hash`), the algorithm and its specified parameters, any
+    out-of-core training options, and the `hash_type`. Computing it
+    doesn't require loading the dataset.
+
+    Returns
+    -------
+    hex digest string
+    """
+    fingerprint = {
+        'dataset_hashes': {k:v for k, v in dataset_metadata.items()
+                           if k.endswith('_hash') or k == 'hash_type'},
+        'algorithm_name': td['algorithm_name'],
+        'algorithm_params': td.get('algorithm_params', {}),
+        'hash_type': hash_type,
+    }
+    training_options = {k:td[k] for k in _TRAINING_OPTIONS if k in td}
+    if training_options:
+        fingerprint['training_options'] = training_options
+    fingerprint_str = json.dumps(fingerprint, sort_keys=True, default=str)
+    return hashlib.sha1(fingerprint_str.encode('utf-8')).hexdigest()
+
+def _estimate_duration(model_key, td, saved_models):
+    """Estimate the training time of a model from previous training runs
+
+    Uses the recorded `duration` of the saved model itself if there is one,
+    or else the mean duration of saved models with the same algorithm and dataset.
+
+    Returns
+    -------
+    duration in seconds, or None if there is no previous run to go on
+    """
+    saved_metadata = saved_models.get(model_key, {})
+    if saved_metadata.get('duration', None) is not None:
+        return saved_metadata['duration']
+    durations = [meta['duration'] for meta in saved_models.values()
+                 if meta.get('algorithm_name', None) == td['algorithm_name'] and
+                 meta.get('dataset_name', None) == td['dataset_name'] and
+                 meta.get('duration', None) is not None]
+    if durations:
+        return sum(durations) / len(durations)
+    return None
+
+def plan_models(model_file='model_list.json', model_dir=None, hash_type='sha1',
+                incremental=False):
+    """Validate the model list, and plan the training needed to build it.
+
+    Sweep entries are expanded into one model per parameter setting
+    (see `folklore.models.sweep`). All entries are checked (for unknown
+    datasets and algorithms, invalid sweeps, and colliding model keys)
+    before anything is trained, and every problem found is reported at once.
+
+    Parameters
+    ----------
+    model_file: filename
+        json file specifying list of options dictionaries to be passed to
+        `train_model`
+    model_dir: path
+        location of `model_file`
+    hash_type: {'sha1', 'md5', 'sha256'}
+        type of hash to use for caching of python objects
+    incremental: boolean
+        If True, models that are already up to date are not (re)trained.
+        See `build_models`.
+
+    Returns
+    -------
+    List of dicts (one per model, in model list order) with keys:
+
+    model_key:
+        {algorithm}_{dataset}_{run_number}, or for models in a sweep,
+        {algorithm}_{dataset}_{run_number}_{sweep_index}
+    training_dict:
+        options to be passed to `train_model`
+    fingerprint:
+        training fingerprint of the model
+    status: {'new', 'stale', 'current', 'eliminated'}
+        whether the model has no saved version, a saved version trained
+        on different inputs, or an up-to-date saved version; or whether
+        it was eliminated by a (still up-to-date) successive halving sweep
+    train: boolean
+        whether the model will be trained. For candidates of a halving
+        sweep, only if selected.
+    estimated_duration:
+        expected training time (in seconds), based on previous training
+        runs, or None if unknown
+    saved_metadata:
+        metadata of the saved model (or None)
+    sweep_key:
+        {algorithm}_{dataset}_{run_number} of the sweep this model is part of (or None)
+    halving:
+        successive halving options, if this model is a candidate awaiting
+        selection (see `folklore.models.sweep`), or None
+    """
+    training_dicts = get_model_list(model_dir=model_dir, model_file=model_file)
+
+    dataset_metadata = available_datasets(keys_only=False)
+    algorithm_list = available_algorithms()
+    saved_models = available_models(keys_only=False)
+
+    plan = []
+    errors = []
+    model_keys = set()  # Used to ensure uniqueness of keys
+    for index, entry in enumerate(training_dicts):
+        ds_name = entry.get('dataset_name', None)
+        alg_name = entry.get('algorithm_name', None)
+        run_number = entry.get('run_number', 0)
+        sweep_key = f"{alg_name}_{ds_name}_{run_number}"
+        if ds_name not in dataset_metadata:
+            errors.append(f'entry {index}: Unknown Dataset: {ds_name}')
+        elif 'base_dataset' in dataset_metadata[ds_name]:
+            # a view's hashes only cover its indices, and the base it was written against
+            view_meta = dataset_metadata[ds_name]
+            base_meta = dataset_metadata.get(view_meta['base_dataset'], {})
+            if any(view_meta.get(f'base_{k}', None) != base_meta.get(k, None)
+                   for k in ['data_hash', 'target_hash']):
+                errors.append(f'entry {index}: Dataset view {ds_name} is stale: its base '
+                              f"dataset {view_meta['base_dataset']} has changed")
+        if alg_name not in algorithm_list:
+            errors.append(f'entry {index}: Unknown Algorithm: {alg_name}')
+        try:
+            expanded = expand_sweep({**entry, 'run_number': run_number})
+        except Exception as err:
+            errors.append(f'entry {index}: Invalid sweep: {err}')
+            continue
+        entry_jobs = []
+        for td in expanded:
+            model_key = sweep_key
+            if 'sweep_index' in td:
+                model_key += f"_{td['sweep_index']}"
+            if model_key in model_keys:
+                errors.append(f'entry {index}: {model_key} already exists. Give a unique '
+                              '`run_number` to avoid collisions.')
+            model_keys.add(model_key)
+            if errors:
+                continue
+
+            fingerprint = _training_fingerprint(td, dataset_metadata[ds_name], hash_type)
+            saved_metadata = saved_models.get(model_key, None)
+            if saved_metadata is None:
+                status = 'new'
+            elif (saved_metadata.get('training_fingerprint', None) != fingerprint or
+                  not (trained_model_path / f'{model_key}.model').exists()):
+                status = 'stale'
+            else:
+                status = 'current'
+            entry_jobs.append({
+                'model_key': model_key,
+                'training_dict': td,
+                'fingerprint': fingerprint,
+                'status': status,
+                'train': status != 'current' or not incremental,
+                'estimated_duration': _estimate_duration(model_key, td, saved_models),
+                'saved_metadata': saved_metadata,
+                'sweep_key': sweep_key if 'sweep_index' in td else None,
+                'halving': None,
+            })
+
+        halving = entry.get('halving', None)
+        if halving is not None and entry_jobs:
+            fingerprint = sweep_fingerprint([job['fingerprint'] for job in entry_jobs], halving)
+            record = load_sweep_record(sweep_key)
+            if incremental and record is not None and record['fingerprint'] == fingerprint:
+                for job in entry_jobs:
+                    if job['model_key'] not in record['promoted']:
+                        job['status'] = 'eliminated'
+                        job['train'] = False
+            else:
+                for job in entry_jobs:
+                    job['halving'] = halving
+                    job['sweep_fingerprint'] = fingerprint
+        plan += entry_jobs
+
+    if errors:
+        raise Exception(f"Invalid model list ({len(errors)} errors):\n" + "\n".join(errors))
+    return plan
+
+def describe_plan(plan):
+    """Summarize a training plan (from `plan_models`) as a printable table
+
+    Durations are estimated from previous training runs, and the total is
+    for training serially. Candidates awaiting successive halving are
+    listed with the action `select`; which of them will be trained isn't
+    known until the selection has run, so they aren't included in the total.
+    """
+    width = max([len('model_key')] + [len(job['model_key']) for job in plan])
+    lines = [f"{'model_key':<{width}}  {'status':<10}  {'action':<6}  est. duration"]
+    total = 0
+    n_unknown = 0
+    for job in plan:
+        duration = job['estimated_duration']
+        if duration is None:
+            duration_str = 'unknown'
+        else:
+            duration_str = f'{duration:.2f}s'
+        if job['halving'] is not None:
+            action = 'select'
+        else:
+            action = 'train' if job['train'] else 'skip'
+        lines.append(f"{job['model_key']:<{width}}  {job['status']:<10}  "
+                     f"{action:<6}  {duration_str}")
+        if action == 'train':
+            if duration is None:
+                n_unknown += 1
+            else:
+                total += duration
+    n_select = sum(1 for job in plan if job['halving'] is not None)
+    n_train = sum(1 for job in plan if job['train'] and job['halving'] is None)
+    summary = f"{n_train} to train (est. {total:.2f}s"
+    if n_unknown:
+        summary += f", plus {n_unknown} of unknown duration"
+    summary += f"), {len(plan) - n_train - n_select} to skip"
+    if n_select:
+        summary += f", {n_select} candidates for successive halving"
+    lines.append(summary)
+    return "\n".join(lines)
+
+def summarize_profiles(model_metadata):
+    """Aggregate the training profiles of several models
+
+    Phases shared by several models (e.g. a dataset load, when training in
+    groups) are marked with `shared_by`, and counted only once.
+
+    Parameters
+    ----------
+    model_metadata: dict
+        model metadata keyed by model_key, as returned by `build_models`
+        (and saved in `trained_models.json`). Entries without a `profile`
+        (such as the saved `profile_summary`) are ignored.
+
+    Returns
+    -------
+    dict mapping each phase (`load`, `hash`, `fit`, `save`) to its total
+    `wall_s` and `cpu_s`, the largest `peak_rss_delta_bytes` of any model,
+    and overall `rows_per_s` (where rows were counted). Models without a
+    `profile` are ignored.
+
+    Examples
+    --------
+    >>> meta = {'a': {'profile': {'fit': {'wall_s': 2.0, 'cpu_s': 4.0,
+    ...                                   'peak_rss_delta_bytes': 100, 'rows_per_s': 50.0}}},
+    ...         'b': {'profile': {'fit': {'wall_s': 1.0, 'cpu_s': 1.0,
+    ...                                   'peak_rss_delta_bytes': 300, 'rows_per_s': 100.0}}},
+    ...         'c': {}}
+    >>> summarize_profiles(meta)['fit']
+    {'wall_s': 3.0, 'cpu_s': 5.0, 'peak_rss_delta_bytes': 300, 'rows_per_s': 66.66666666666667}
+    """
+    summary = {}
+    for metadata in model_metadata.values():
+        for phase, stats in (metadata.get('profile', None) or {}).items():
+            total = summary.setdefault(phase, {'wall_s': 0.0, 'cpu_s': 0.0,
+                                               'peak_rss_delta_bytes': None, 'rows': 0,
+                                               'rows_wall_s': 0.0})
+            shared_by = stats.get('shared_by', 1)
+            total['wall_s'] += stats['wall_s'] / shared_by
+            total['cpu_s'] += stats['cpu_s'] / shared_by
+            if stats['peak_rss_delta_bytes'] is not None:
+                total['peak_rss_delta_bytes'] = max(total['peak_rss_delta_bytes'] or 0,
+                                                    stats['peak_rss_delta_bytes'])
+            if stats.get('rows_per_s', None):
+                total['rows'] += stats['rows_per_s'] * stats['wall_s'] / shared_by
+                total['rows_wall_s'] += stats['wall_s'] / shared_by
+    for total in summary.values():
+        rows, rows_wall_s = total.pop('rows'), total.pop('rows_wall_s')
+        total['rows_per_s'] = rows / rows_wall_s if rows_wall_s else None
+    phases = ['parent_load', 'load', 'hash', 'fit', 'save']
+    return {phase: summary[phase] for phase in
+            sorted(summary, key=lambda p: (phases.index(p) if p in phases else len(phases), p))}
+
+def _train_and_save(model_key, td, hash_type, fingerprint=None, update=False,
+                    compress=0, **train_opts):
+    """Train and save a single model from the model list.
+
+    update: boolean
+        If True, first try to update the saved model with the rows added to
+        its dataset (see `update_model`). If that isn't possible (e.g. there
+        are no new rows, or the training options have changed), the model
+        is trained from scratch.
+    compress:
+        compression to use when saving the model (see `save_model`)
+    train_opts:
+        additional options passed to `train_model` (or `update_model`)
+
+    Returns
+    -------
+    Tuple (model_key, saved model metadata)
+    """
+    new_metadata = None
+    if update:
+        try:
+            training_options = {k:td[k] for k in _TRAINING_OPTIONS if k in td}
+            trained_model, new_metadata = update_model(model_key, td.get('algorithm_params', None),
+                                                       hash_type=hash_type, **training_options,
+                                                       **train_opts)
+            logger.info(f'Updated model: {model_key}')
+        except ModelNotUpdatable as err:
+            logger.warning(f'Could not update {model_key} ({err}). Retraining it.')
+    if new_metadata is None:
+        logger.info(f'Creating model: {model_key}')
+        trained_model, added_metadata = train_model(hash_type=hash_type,
+                                                    **train_opts, **td)
+        # replace specified params with full set of params used
+        td = {**td, 'algorithm_params': dict(trained_model.get_params())}
+        new_metadata = {**td, **added_metadata}
+    new_metadata['training_fingerprint'] = fingerprint
+    return model_key, save_model(model_name=model_key,
+                                 model=trained_model,
+                                 metadata=new_metadata,
+                                 hash_type=hash_type,
+                                 compress=compress)
+
+def build_models(model_file='model_list.json', model_dir=None, hash_type='sha1',
+                 n_jobs=1, incremental=False, update=False, compress=0, run_profile=None):
     """Build, train, and save models.
 
     Trained models are written to `trained_model_path`.
 
+    The build runs in two phases. First, the model list is validated and
+    turned into a list of training jobs (see `plan_models`). Then, each
+    job is trained (once).
+
+    Sweep entries in the model list are expanded into one model per
+    parameter setting. For sweeps using successive halving, the candidates
+    are compared on fractions of the data first, and only those promoted
+    are trained (see `folklore.models.sweep`).
+
+    Jobs are grouped by dataset. Each dataset is loaded and hashed once
+    (or not at all, if its metadata already records hashes of the right
+    `hash_type`), used to train every model in its group, and released
+    before moving on to the next group.
+
+    Model list entries may also give out-of-core training options
+    (`block_size`, `n_epochs`, `shuffle`, `shuffle_seed`; see `train_model`),
+    to train estimators supporting `partial_fit` on memory-mapped data,
+    a block of rows at a time.
+
+    With `n_jobs` > 1, models are trained in a pool of worker processes.
+    Workers memory-map their datasets (rather than each reading a private
+    copy, or having them pickled from this process), so concurrent models
+    on the same dataset share its pages. To avoid oversubscribing the CPUs,
+    each worker gets `cpu_count // n_jobs` threads: its BLAS/OpenMP thread
+    pools are limited to this, and so is the `n_jobs` of any estimator asking
+    for more (e.g. `n_jobs=-1`).
+
+    Every model's metadata records a `training_fingerprint` of its inputs:
+    the dataset hashes, the algorithm and its parameters (as given in the
+    model list), and the hash type. In `incremental` mode, models whose saved
+    fingerprint matches the planned one are skipped, and their saved
+    metadata returned instead.
+
+    With `update`, stale models are updated rather than retrained where
+    possible: estimators supporting `partial_fit` or `warm_start`, whose
+    datasets have only had rows appended, are fed the new data (see
+    `update_model`). Each model's `lineage` metadata records the data
+    hashes it has been trained on.
+
+    Each model's `profile` metadata records the wall-clock time, CPU time,
+    peak memory increase (and rows/s) of each phase of its training: `load`,
+    `hash`, `fit` and `save`. Phases run once for a whole group of models
+    are marked with `shared_by`. When training in parallel, this process
+    also loads (memory-maps) each dataset to hash it: this is recorded as
+    the `parent_load` phase. A summary (see `summarize_profiles`) of the
+    models trained in this run is logged, and stored in `run_profile`.
+
     For every model, we write:
 
     {model_key}.model:
@@ -139,6 +543,20 @@ def build_models(model_file='model_list.json', model_dir=None, hash_type='sha1')
         location of `model_file`
     hash_name: {'sha1', 'md5', 'sha256'}
         type of hash to use for caching of python objects
+    n_jobs: int
+        Number of models to train at once (a positive integer). If -1,
+        use all CPUs.
+    incremental: boolean
+        If True, only train models that are new, or whose inputs have
+        changed since they were last trained.
+    update: boolean
+        If True, update stale models incrementally where possible
+    compress: int, str or tuple
+        compression to use for the saved models (see `save_model`).
+        Uncompressed models can be memory-mapped by `load_model`.
+    run_profile: dict or None
+        If given, it is updated with the profile summary of the models
+        trained in this run (empty if none were trained)
 
     Returns
     -------
@@ -154,41 +572,102 @@ def build_models(model_file='model_list.json', model_dir=None, hash_type='sha1')
 
     The combination of these 3 things must be unique.
     """
-    training_dicts = get_model_list(model_dir=model_dir, model_file=model_file)
-
-    dataset_list = available_datasets()
-    algorithm_list = available_algorithms()
-
-    metadata_dict = {}  # Used to ensure uniqueness of keys
-    for td in training_dicts:
-        ds_name = td.get('dataset_name', None)
-        assert ds_name in dataset_list, f'Unknown Dataset: {ds_name}'
-
-        alg_name = td.get('algorithm_name', None)
-        assert alg_name in algorithm_list, f'Unknown Algorithm: {alg_name}'
-
-        run_number = td.get('run_number', 0)
-        model_key = f"{alg_name}_{ds_name}_{run_number}"
-        if model_key in metadata_dict:
-            raise Exception("{id_base} already exists. Give a unique " +
-                            "`run_number` to avoid collisions.")
-        else:
-            td['run_number'] = run_number
-            metadata_dict[model_key] = td
-
-        saved_meta = {}
-        for model_key, td in metadata_dict.items():
-            logger.info(f'Creating model: {model_key}')
-            trained_model, added_metadata = train_model(hash_type=hash_type,
-                                                        **td)
-            # replace specified params with full set of params used
-            td['algorithm_params'] = dict(trained_model.get_params())
-            new_metdata = {**td, **added_metadata}
-            saved_meta[model_key] = save_model(model_name=model_key,
-                                               model=trained_model,
-                                               metadata=new_metdata)
-
-    return saved_meta
+    n_jobs = resolve_n_jobs(n_jobs)
+    plan = plan_models(model_file=model_file, model_dir=model_dir,
+                       hash_type=hash_type, incremental=incremental)
+
+    sweeps = {}
+    for job in plan:
+        if job['halving'] is not None:
+            sweeps.setdefault(job['sweep_key'], []).append(job)
+    for sweep_key, candidates in sweeps.items():
+        promoted = select_candidates(sweep_key, candidates,
+                                     n_jobs=None if n_jobs == 1 else n_jobs)
+        for job in candidates:
+            job['halving'] = None
+            if job['model_key'] not in promoted:
+                job['status'] = 'eliminated'
+                job['train'] = False
+            elif incremental and job['status'] == 'current':
+                job['train'] = False
+
+    jobs = [job for job in plan if job['train']]
+
+    n_jobs = min(n_jobs, max(len(jobs), 1))
+
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job['training_dict']['dataset_name'], []).append(job)
+
+    if n_jobs == 1:
+        results = []
+        for ds_name, group in groups.items():
+            logger.debug(f'Training {len(group)} models on {ds_name}')
+            # out-of-core jobs need the dataset memory-mapped, not in memory
+            out_of_core = any(job['training_dict'].get('block_size', None) is not None
+                              for job in group)
+            group_profile = {}
+            with profile_phase(group_profile, 'load'):
+                ds = Dataset.load(ds_name, mmap_mode='r' if out_of_core else None)
+            data_hashes = dataset_hashes(ds, hash_type=hash_type, profile=group_profile)
+            group_profile = {phase: {**stats, 'shared_by': len(group)}
+                             for phase, stats in group_profile.items()}
+            for job in group:
+                results.append(_train_and_save(job['model_key'], job['training_dict'],
+                                               hash_type, fingerprint=job['fingerprint'],
+                                               update=update and job['status'] == 'stale',
+                                               compress=compress, dataset=ds,
+                                               data_hashes=data_hashes, profile=group_profile))
+            del ds
+    else:
+        import joblib
+        n_threads = max(1, os.cpu_count() // n_jobs)
+        logger.info(f'Training {len(jobs)} models with {n_jobs} workers '
+                    f'({n_threads} threads each)')
+        # Workers memory-map the datasets themselves; jobs are submitted in
+        # dataset order, so concurrent jobs mostly share the same mapped pages.
+        tasks = []
+        for ds_name, group in groups.items():
+            group_profile = {}
+            with profile_phase(group_profile, 'parent_load'):
+                ds = Dataset.load(ds_name, mmap_mode='r')
+            data_hashes = dataset_hashes(ds, hash_type=hash_type, profile=group_profile)
+            del ds
+            group_profile = {phase: {**stats, 'shared_by': len(group)}
+                             for phase, stats in group_profile.items()}
+            tasks += [joblib.delayed(_train_and_save)(job['model_key'], job['training_dict'],
+                                                      hash_type, fingerprint=job['fingerprint'],
+                                                      update=update and job['status'] == 'stale',
+                                                      compress=compress, data_hashes=data_hashes,
+                                                      profile=group_profile,
+                                                      mmap_mode='r', max_n_jobs=n_threads)
+                      for job in group]
+        with joblib.parallel_backend('loky', inner_max_num_threads=n_threads):
+            results = joblib.Parallel(n_jobs=n_jobs)(tasks)
+    saved_meta = {job['model_key']: job['saved_metadata'] for job in plan
+                  if job['status'] == 'current' and not job['train']}
+    saved_meta.update(results)
+
+    if results:
+        summary = summarize_profiles(dict(results))
+        if run_profile is not None:
+            run_profile.update(summary)
+        logger.info('Training profile: ' + '; '.join(
+            f"{phase} {stats['wall_s']:.2f}s ({stats['cpu_s']:.2f}s CPU"
+            + (f", {stats['rows_per_s']:.0f} rows/s" if stats['rows_per_s'] else '') + ')'
+            for phase, stats in summary.items()))
+
+    n_eliminated = sum(1 for job in plan if job['status'] == 'eliminated')
+    if n_eliminated:
+        logger.info(f'Successive halving eliminated {n_eliminated} candidate models')
+    if incremental:
+        n_stale = sum(1 for job in jobs if job['status'] == 'stale')
+        logger.info(f'Trained {len(jobs)} models ({n_stale} stale, '
+                    f'{len(jobs) - n_stale} new); '
+                    f'skipped {len(plan) - len(jobs) - n_eliminated} up-to-date models')
+
+    return {job['model_key']: saved_meta[job['model_key']] for job in plan
+            if job['model_key'] in saved_meta}
 
 def available_models(models_dir=None, keys_only=True):
     """Get a list of trained models.
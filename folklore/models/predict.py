@@ -1,4 +1,3 @@
-import joblib
 import json
 import os
 import pathlib
@@ -8,7 +7,7 @@ from ..data import Dataset
 from ..logging import logger
 from ..paths import model_path, model_output_path
 from ..utils import record_time_interval, save_json
-from .train import load_model
+from .train import load_model, saved_model_hash
 from .model_list import get_model_list
 from ..data import available_datasets
 
@@ -27,6 +26,7 @@ def run_model(experiment_info=None,
               hash_type='sha1',
               output_path=None,
               run_number=1,
+              mmap_mode=None,
               *,
               dataset_name,
               is_supervised,
@@ -54,12 +54,18 @@ def run_model(experiment_info=None,
         attempt number via the same parameters
     force: (boolean)
         force re-running the algorithm and overwriting any existing data.
+    mmap_mode: {None, 'r+', 'r', 'w+', 'c'}
+        If not None, memory-map the model's numpy arrays when loading it
+        (see `load_model`). 'r' is usually best for large models used only
+        for prediction.
 
     Returns
     -------
     Dataset object emerging from the model,
     with experiment dictionary embedded in metadata
     '''
+    import joblib
+
     if output_path is None:
         output_path = model_output_path
     else:
@@ -72,7 +78,7 @@ def run_model(experiment_info=None,
 
     dataset = Dataset.load(dataset_name)
 
-    model, model_meta = load_model(model_name)
+    model, model_meta = load_model(model_name, mmap_mode=mmap_mode)
 
     # add experiment metadata
     experiment = {
@@ -80,9 +86,9 @@ def run_model(experiment_info=None,
         'dataset_name': dataset_name,
         'run_number': run_number,
         'hash_type': hash_type,
-        'input_data_hash': joblib.hash(dataset.data, hash_name=hash_type),
-        'input_target_hash': joblib.hash(dataset.target, hash_name=hash_type),
-        'model_hash': joblib.hash(model, hash_name=hash_type),
+        'input_data_hash': joblib.hash(dataset.data, hash_name=hash_type, coerce_mmap=True),
+        'input_target_hash': joblib.hash(dataset.target, hash_name=hash_type, coerce_mmap=True),
+        'model_hash': saved_model_hash(model_name, hash_type=hash_type, metadata=model_meta),
     }
     logger.debug(f"Predict: Applying {model_name} to {dataset_name}")
     metadata_fq = output_path / f'{output_dataset}.metadata'
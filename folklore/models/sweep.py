@@ -0,0 +1,215 @@
+'''Hyperparameter sweeps in the model list
+
+In addition to its (fixed) `algorithm_params`, a model list entry may
+describe a whole family of models, using one of:
+
+param_grid: dict, or list of dicts
+    mapping parameter names to lists of values to try, as in
+    `sklearn.model_selection.ParameterGrid`. Every combination is used.
+param_distributions: dict
+    mapping parameter names to either a list of values (sampled uniformly),
+    or a dict `{"distribution": name, "args": [...]}` naming a distribution
+    in `scipy.stats`. `n_iter` settings are drawn, as in
+    `sklearn.model_selection.ParameterSampler`, using `random_state`
+    (default 0, so that the sweep is the same every time it is expanded).
+
+Each setting becomes a separate model, with model key
+`{algorithm}_{dataset}_{run_number}_{i}`.
+
+An entry may also specify `halving`: a dict of options for a successive
+halving scheduler (see `successive_halving`). Rather than training every
+setting on the full dataset, the settings are first compared on small
+(and then successively larger) fractions of the data, and only the
+`n_promote` most promising are trained in full.
+'''
+import hashlib
+import json
+import pathlib
+
+from ..data import Dataset
+from ..logging import logger
+from ..paths import trained_model_path
+from ..utils import load_json, save_json
+from .algorithms import available_algorithms
+
+__all__ = [
+    'expand_sweep',
+    'load_sweep_record',
+    'select_candidates',
+    'successive_halving',
+    'sweep_fingerprint',
+]
+
+_SWEEP_KEYS = ['param_grid', 'param_distributions', 'n_iter', 'random_state', 'halving']
+
+_HALVING_DEFAULTS = {
+    'n_promote': 1,
+    'factor': 3,
+    'min_resources': 'exhaust',
+    'cv': 3,
+    'scoring': None,
+    'random_state': 0,
+}
+
+def _parse_distributions(param_distributions):
+    """Convert json-style distribution specs to `scipy.stats` distributions"""
+    parsed = {}
+    for name, spec in param_distributions.items():
+        if isinstance(spec, dict):
+            import scipy.stats
+            dist = getattr(scipy.stats, spec['distribution'], None)
+            if dist is None:
+                raise Exception(f"Unknown distribution for {name}: {spec['distribution']}")
+            parsed[name] = dist(*spec.get('args', []), **spec.get('kwargs', {}))
+        else:
+            parsed[name] = spec
+    return parsed
+
+def _as_python(value):
+    """Convert numpy scalars (e.g. from sampled distributions) to python types"""
+    return value.item() if hasattr(value, 'item') else value
+
+def expand_sweep(td):
+    """Expand a model list entry into the list of models it describes
+
+    Parameters
+    ----------
+    td: dict
+        model list entry (see module documentation)
+
+    Returns
+    -------
+    list of training dicts. If `td` contains no sweep, this is just `[td]`.
+    Otherwise, there is one dict per parameter setting, with the setting
+    merged into `algorithm_params`, and with `sweep_index` set.
+    """
+    param_grid = td.get('param_grid', None)
+    param_distributions = td.get('param_distributions', None)
+    if param_grid is None and param_distributions is None:
+        if td.get('halving', None) is not None:
+            raise Exception('`halving` requires a `param_grid` or `param_distributions`')
+        return [td]
+    if param_grid is not None and param_distributions is not None:
+        raise Exception('Specify only one of `param_grid` and `param_distributions`')
+
+    from sklearn.model_selection import ParameterGrid, ParameterSampler
+    if param_grid is not None:
+        settings = list(ParameterGrid(param_grid))
+    else:
+        settings = list(ParameterSampler(_parse_distributions(param_distributions),
+                                         n_iter=td.get('n_iter', 10),
+                                         random_state=td.get('random_state', 0)))
+
+    base = {k:v for k, v in td.items() if k not in _SWEEP_KEYS}
+    fixed_params = td.get('algorithm_params', None) or {}
+    expanded = []
+    for i, setting in enumerate(settings):
+        params = {k:_as_python(v) for k, v in setting.items()}
+        expanded.append({**base,
+                         'algorithm_params': {**fixed_params, **params},
+                         'sweep_index': i})
+    return expanded
+
+def sweep_fingerprint(fingerprints, halving):
+    """Fingerprint of a halving sweep: its candidates' training fingerprints and options"""
+    sweep_str = json.dumps({'candidates': fingerprints, 'halving': halving},
+                           sort_keys=True, default=str)
+    return hashlib.sha1(sweep_str.encode('utf-8')).hexdigest()
+
+def load_sweep_record(sweep_key, model_path=None):
+    """Load the saved outcome of a halving sweep, or None if there isn't one"""
+    if model_path is None:
+        model_path = trained_model_path
+    try:
+        return load_json(pathlib.Path(model_path) / f'{sweep_key}.sweep')
+    except FileNotFoundError:
+        return None
+
+def successive_halving(dataset_name, algorithm_name, candidates, halving=None, n_jobs=None):
+    """Rank parameter settings by successive halving
+
+    Uses scikit-learn's `HalvingGridSearchCV` (with `n_samples` as the
+    resource): all candidates are cross-validated on a small sample of the
+    dataset, and the best `1/factor` of them on a `factor` times larger
+    sample, and so on.
+
+    Parameters
+    ----------
+    dataset_name: str
+        dataset to use (memory-mapped)
+    algorithm_name: str
+        algorithm (estimator) to use
+    candidates: list of dicts
+        `algorithm_params` of each candidate
+    halving: dict or None
+        options passed to `HalvingGridSearchCV` (e.g. `factor`, `min_resources`,
+        `cv`, `scoring`, `random_state`), plus `n_promote` (ignored here)
+    n_jobs: int or None
+        passed to `HalvingGridSearchCV`
+
+    Returns
+    -------
+    list of (candidate index, last iteration reached, mean score in that iteration),
+    best candidate first
+    """
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingGridSearchCV
+
+    opts = {**_HALVING_DEFAULTS, **(halving or {})}
+    opts.pop('n_promote')
+    ds = Dataset.load(dataset_name, mmap_mode='r')
+    estimator = available_algorithms(keys_only=False)[algorithm_name]
+    param_grid = [{k:[v] for k, v in params.items()} for params in candidates]
+    search = HalvingGridSearchCV(estimator, param_grid, refit=False, n_jobs=n_jobs, **opts)
+    search.fit(ds.data, ds.target)
+
+    results = search.cv_results_
+    reached = {}
+    for it, params, score in zip(results['iter'], results['params'],
+                                 results['mean_test_score']):
+        if score != score:  # failed fits score NaN
+            score = float('-inf')
+        # later iterations overwrite earlier ones
+        reached[candidates.index(params)] = (int(it), float(score))
+    return sorted([(i, it, score) for i, (it, score) in reached.items()],
+                  key=lambda r: (r[1], r[2]), reverse=True)
+
+def select_candidates(sweep_key, jobs, n_jobs=None, model_path=None):
+    """Choose which candidates of a halving sweep should be trained in full
+
+    Runs `successive_halving` over the candidates, and records the outcome
+    in `{sweep_key}.sweep` (in `model_path`), so that an incremental build
+    doesn't need to repeat the selection.
+
+    Parameters
+    ----------
+    sweep_key: str
+        {algorithm}_{dataset}_{run_number} of the model list entry
+    jobs: list
+        the entry's jobs, as returned by `plan_models`
+
+    Returns
+    -------
+    list of model keys of the promoted candidates
+    """
+    if model_path is None:
+        model_path = trained_model_path
+    halving = jobs[0]['halving']
+    n_promote = halving.get('n_promote', _HALVING_DEFAULTS['n_promote'])
+    td = jobs[0]['training_dict']
+    logger.info(f'Successive halving: selecting {n_promote} of {len(jobs)} '
+                f'candidates for {sweep_key}')
+    ranking = successive_halving(td['dataset_name'], td['algorithm_name'],
+                                 [job['training_dict']['algorithm_params'] for job in jobs],
+                                 halving=halving, n_jobs=n_jobs)
+    promoted = [jobs[i]['model_key'] for i, _, _ in ranking[:n_promote]]
+    record = {
+        'fingerprint': jobs[0]['sweep_fingerprint'],
+        'promoted': promoted,
+        'ranking': [{'model_key': jobs[i]['model_key'], 'iter': it, 'score': score}
+                    for i, it, score in ranking],
+    }
+    pathlib.Path(model_path).mkdir(parents=True, exist_ok=True)
+    save_json(pathlib.Path(model_path) / f'{sweep_key}.sweep', record)
+    logger.info(f'Successive halving: promoted {promoted}')
+    return promoted
@@ -1,43 +1,412 @@
+import contextlib
+import inspect
 import json
-import joblib
 import pathlib
 import logging
 import time
 
+import numpy as np
+
 from .. import paths
 from ..paths import trained_model_path, model_path
-from ..utils import save_json, load_json, record_time_interval
-from ..data import Dataset, available_datasets
+from ..utils import save_json, load_json, record_time_interval, profile_phase
+from ..data import Dataset, available_datasets, hash_file
 from .algorithms import available_algorithms
 from ..logging import logger
 
 __all__ = [
+    'ModelNotUpdatable',
+    'dataset_hashes',
+    'iter_row_blocks',
     'load_model',
+    'partial_fit_blocks',
     'save_model',
+    'saved_model_hash',
     'train_model',
+    'update_model',
 ]
 
+class ModelNotUpdatable(Exception):
+    """Raised by `update_model` when a saved model can't be updated, and must be retrained"""
+
+def _n_rows(data):
+    """Number of rows of an array, sparse matrix, DataFrame or list"""
+    if hasattr(data, 'shape'):
+        return data.shape[0]
+    return len(data)
+
+def _take_rows(arr, rows):
+    """Select rows (a slice or index array) from an array or DataFrame"""
+    if arr is None:
+        return None
+    if hasattr(arr, 'iloc'):
+        return arr.iloc[rows]
+    return arr[rows]
+
+def iter_row_blocks(data, target=None, start=0, stop=None, block_size=None,
+                    shuffle=False, random_state=None):
+    """Iterate over rows `start:stop` of (data, target), `block_size` rows at a time
+
+    Works with arrays, memory-mapped arrays and DataFrames. With memory-mapped
+    data, only the current block is read into memory.
+
+    shuffle: boolean
+        If True, visit the blocks in a random order, and shuffle the rows
+        within each block. Rows are still read from disk a (contiguous)
+        block at a time.
+    random_state: int, RandomState or None
+        Seed for shuffling
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> [y.tolist() for X, y in iter_row_blocks(np.zeros((5, 2)), np.arange(5), block_size=2)]
+    [[0, 1], [2, 3], [4]]
+    >>> [y.tolist() for X, y in iter_row_blocks(np.zeros((5, 2)), np.arange(5), start=3)]
+    [[3, 4]]
+    >>> blocks = iter_row_blocks(np.zeros((5, 2)), np.arange(5), block_size=2,
+    ...                          shuffle=True, random_state=0)
+    >>> sorted(sum([y.tolist() for X, y in blocks], []))
+    [0, 1, 2, 3, 4]
+    """
+    if stop is None:
+        stop = _n_rows(data)
+    if block_size is None:
+        block_size = max(stop - start, 1)
+    block_starts = np.arange(start, stop, block_size)
+    if shuffle:
+        if isinstance(random_state, np.random.RandomState):
+            rng = random_state
+        else:
+            rng = np.random.RandomState(random_state)
+        block_starts = rng.permutation(block_starts)
+    for block_start in block_starts:
+        rows = slice(block_start, min(block_start + block_size, stop))
+        X, y = _take_rows(data, rows), _take_rows(target, rows)
+        if shuffle:
+            perm = rng.permutation(rows.stop - rows.start)
+            X, y = _take_rows(X, perm), _take_rows(y, perm)
+        yield X, y
+
+def partial_fit_blocks(model, data, target=None, start=0, block_size=None, n_epochs=1,
+                       shuffle=False, random_state=None):
+    """Fit an estimator incrementally, feeding `partial_fit` a block of rows at a time
+
+    Memory use is governed by `block_size`, not by the size of the dataset,
+    provided `data` and `target` are memory-mapped (see `Dataset.load`).
+    If the estimator's `partial_fit` takes `classes` (as classifiers' do),
+    and it hasn't been fit before, the classes are taken from `target`.
+
+    Parameters
+    ----------
+    model:
+        estimator supporting `partial_fit`
+    start: int
+        first row to use
+    block_size: int or None
+        rows per `partial_fit` call. If None, all rows at once.
+    n_epochs: int
+        number of passes over the data
+    shuffle: boolean
+        If True, shuffle the order of blocks (and of rows within each block)
+        on every pass. See `iter_row_blocks`.
+    random_state: int or None
+        Seed for shuffling
+
+    Returns
+    -------
+    the fitted model
+    """
+    if not hasattr(model, 'partial_fit'):
+        raise Exception(f'{type(model).__name__} does not support `partial_fit`')
+    fit_opts = {}
+    if (target is not None and not hasattr(model, 'classes_') and
+            'classes' in inspect.signature(model.partial_fit).parameters):
+        fit_opts['classes'] = np.unique(target)
+    rng = np.random.RandomState(random_state)
+    for _ in range(n_epochs):
+        for X, y in iter_row_blocks(data, target, start=start, block_size=block_size,
+                                    shuffle=shuffle, random_state=rng):
+            model.partial_fit(X, y, **fit_opts)
+    return model
+
+@contextlib.contextmanager
+def _capped_n_jobs(model, max_n_jobs):
+    """Cap the estimator's `n_jobs` (if it has one) at `max_n_jobs`, restoring it afterwards"""
+    n_jobs = model.get_params().get('n_jobs', None)
+    capped = (max_n_jobs is not None and n_jobs is not None and
+              (n_jobs < 0 or n_jobs > max_n_jobs))
+    if capped:
+        model.set_params(n_jobs=max_n_jobs)
+    try:
+        yield model
+    finally:
+        if capped:
+            model.set_params(n_jobs=n_jobs)
+
+def _recorded_hashes(dataset, hash_type):
+    """The data hashes recorded in a dataset's metadata (with `hash_type`), or None"""
+    metadata = dataset.get('metadata', None) or {}
+    if (metadata.get('hash_type', None) == hash_type and
+            'data_hash' in metadata and 'target_hash' in metadata):
+        return {'data_hash': metadata['data_hash'],
+                'target_hash': metadata['target_hash']}
+    return None
+
+def dataset_hashes(dataset, hash_type='sha1', profile=None):
+    """Compute the `data_hash` and `target_hash` of a dataset
+
+    If the dataset's metadata already records these hashes (as
+    `Dataset.dump` does), computed with `hash_type`, they are reused.
+
+    profile: dict or None
+        If given, the resources used are recorded in it as the `hash` phase
+        (see `profile_phase`). Its `rows_per_s` is only recorded if the
+        data was actually hashed.
+
+    Returns
+    -------
+    dict with keys: data_hash, target_hash
+    """
+    hashes = _recorded_hashes(dataset, hash_type)
+    if profile is None:
+        measured = contextlib.nullcontext()
+    else:
+        measured = profile_phase(profile, 'hash',
+                                 n_rows=None if hashes is not None else _n_rows(dataset.data))
+    with measured:
+        if hashes is None:
+            import joblib
+            # coerce_mmap: memory-mapped arrays hash the same as in-memory ones
+            hashes = {
+                'data_hash': joblib.hash(dataset.data, hash_name=hash_type, coerce_mmap=True),
+                'target_hash': joblib.hash(dataset.target, hash_name=hash_type,
+                                           coerce_mmap=True),
+            }
+    return hashes
+
 def train_model(algorithm_params=None,
                 run_number=0, *, dataset_name, algorithm_name, hash_type,
-                **kwargs):
+                mmap_mode=None, max_n_jobs=None, dataset=None, data_hashes=None,
+                block_size=None, n_epochs=1, shuffle=False, shuffle_seed=None,
+                profile=None, **kwargs):
     """Train a model using the specified algorithm using the given dataset.
 
+    If `block_size` is given, the model is trained out-of-core: the dataset
+    is memory-mapped, and fed to the estimator's `partial_fit` a block of
+    rows at a time (see `partial_fit_blocks`), so memory use depends on
+    `block_size` rather than on the size of the dataset.
+
+    The resources used by each phase of training (`load`, `hash` and `fit`)
+    are measured with `profile_phase`, and recorded in the `profile` metadata.
+
+    mmap_mode: {None, 'r+', 'r', 'w+', 'c'}
+        If not None, the dataset is memory-mapped (see `Dataset.load`)
+    max_n_jobs: int or None
+        If set, and the estimator has an `n_jobs` parameter, cap it at this
+        value while fitting. The original value is restored afterwards.
+    dataset: Dataset or None
+        If given, the (already loaded) `dataset_name` dataset. Saves
+        reloading it when training several models on the same data.
+    data_hashes: dict or None
+        If given, the `data_hash` and `target_hash` of the dataset
+        (computed with `hash_type`). Otherwise, these are computed.
+    block_size: int or None
+        If given, train with `partial_fit` on blocks of this many rows
+    n_epochs: int
+        Number of passes over the data (when training in blocks)
+    shuffle: boolean
+        If True, shuffle the order of the blocks (and of rows within them)
+        on each pass
+    shuffle_seed: int or None
+        Seed for shuffling
+    profile: dict or None
+        phases already measured (e.g. loading a `dataset` shared with other
+        models), to include in the `profile` metadata
     """
     metadata = {}
-    ds = Dataset.load(dataset_name)
-    metadata['data_hash'] = joblib.hash(ds.data, hash_name=hash_type)
-    metadata['target_hash'] = joblib.hash(ds.target, hash_name=hash_type)
+    profile = dict(profile or {})
+    if block_size is not None and mmap_mode is None:
+        mmap_mode = 'r'
+    if dataset is None:
+        with profile_phase(profile, 'load'):
+            ds = Dataset.load(dataset_name, mmap_mode=mmap_mode)
+    else:
+        ds = dataset
+    if data_hashes is None:
+        data_hashes = dataset_hashes(ds, hash_type=hash_type, profile=profile)
+    metadata['data_hash'] = data_hashes['data_hash']
+    metadata['target_hash'] = data_hashes['target_hash']
+    metadata['hash_type'] = hash_type
+    metadata['n_samples'] = _n_rows(ds.data)
+    metadata['lineage'] = [{'data_hash': metadata['data_hash'],
+                            'target_hash': metadata['target_hash'],
+                            'n_samples': metadata['n_samples'],
+                            'method': 'fit'}]
     model = available_algorithms(keys_only=False)[algorithm_name]
     model.set_params(**algorithm_params)
     start_time = time.time()
-    model.fit(ds.data, y=ds.target)
+    with _capped_n_jobs(model, max_n_jobs):
+        if block_size is None:
+            with profile_phase(profile, 'fit', n_rows=metadata['n_samples']):
+                model.fit(ds.data, y=ds.target)
+        else:
+            with profile_phase(profile, 'fit', n_rows=metadata['n_samples'] * n_epochs):
+                partial_fit_blocks(model, ds.data, ds.target, block_size=block_size,
+                                   n_epochs=n_epochs, shuffle=shuffle,
+                                   random_state=shuffle_seed)
     end_time = record_time_interval('train_model', start_time)
     metadata['start_time'] = start_time
     metadata['duration'] = end_time - start_time
+    metadata['profile'] = profile
     return model, metadata
 
+def update_model(model_name, algorithm_params=None, *, hash_type='sha1',
+                 model_path=None, dataset=None, mmap_mode='r', block_size=None,
+                 n_epochs=1, shuffle=False, shuffle_seed=None, max_n_jobs=None,
+                 profile=None, **kwargs):
+    """Update a saved model with the rows added to its dataset since it was trained
+
+    The dataset is expected to have grown by appending rows: the first
+    `n_samples` rows (as recorded in the model's metadata) must hash to
+    the recorded `data_hash` and `target_hash`, and there must be new rows.
+    The out-of-core training options (`block_size`, `n_epochs`, `shuffle`,
+    `shuffle_seed`) must be those the model was trained with. Otherwise,
+    the model can't be updated, and should be retrained: `ModelNotUpdatable`
+    is raised.
+
+    If the estimator supports `partial_fit`, and `algorithm_params` are
+    unchanged, only the new rows are fed to `partial_fit` (`block_size`
+    rows at a time, for `n_epochs` passes; see `partial_fit_blocks`). Otherwise, if the estimator has a `warm_start` parameter,
+    it is refit on the whole dataset, starting from the saved solution
+    (for ensembles, this only adds members if `algorithm_params` increases
+    their number). Otherwise, the model can't be updated.
+
+    Parameters
+    ----------
+    model_name: str
+        name of a saved model
+    algorithm_params: dict or None
+        parameters to apply before updating. If None, use the saved ones.
+    hash_type: {'sha1', 'md5', 'sha256'}
+        hash algorithm used for the saved data hashes
+    model_path: path, default `trained_model_path`
+        where the model is saved
+    dataset: Dataset or None
+        If given, the (already loaded) dataset the model was trained on
+    mmap_mode: {None, 'r+', 'r', 'w+', 'c'}
+        used when loading the dataset
+    block_size: int or None
+        number of rows per `partial_fit` call. If None, all new rows at once.
+    n_epochs, shuffle, shuffle_seed:
+        out-of-core training options (see `train_model`)
+    max_n_jobs: int or None
+        If set, cap the estimator's `n_jobs` at this value while fitting
+    profile: dict or None
+        phases already measured, to include in the `profile` metadata
 
-def save_model(metadata=None, model_path=None, hash_type='sha1',
+    Returns
+    -------
+    Tuple (model, metadata), where `metadata` is the updated model metadata.
+    Its `lineage` lists the data hashes (and sizes) of every dataset
+    the model has been fit or updated on, and the method used. Its
+    `profile` describes the resources used by the update (as in `train_model`).
+    """
+    import joblib
+
+    try:
+        model, metadata = load_model(model_name=model_name, model_path=model_path)
+    except FileNotFoundError as err:
+        raise ModelNotUpdatable(f'{model_name}: {err}') from err
+    n_seen = metadata.get('n_samples', None)
+    if n_seen is None:
+        raise ModelNotUpdatable(f'{model_name}: metadata has no `n_samples`; cannot update')
+    if metadata.get('hash_type', hash_type) != hash_type:
+        raise ModelNotUpdatable(f'{model_name}: saved hashes use {metadata["hash_type"]}, not {hash_type}')
+    training_options = {'block_size': block_size, 'n_epochs': n_epochs,
+                        'shuffle': shuffle, 'shuffle_seed': shuffle_seed}
+    saved_options = {'block_size': metadata.get('block_size', None),
+                     'n_epochs': metadata.get('n_epochs', 1),
+                     'shuffle': metadata.get('shuffle', False),
+                     'shuffle_seed': metadata.get('shuffle_seed', None)}
+    if training_options != saved_options:
+        raise ModelNotUpdatable(f'{model_name}: training options have changed '
+                        f'({saved_options} -> {training_options})')
+    profile = dict(profile or {})
+    if dataset is None:
+        with profile_phase(profile, 'load'):
+            ds = Dataset.load(metadata['dataset_name'], mmap_mode=mmap_mode)
+    else:
+        ds = dataset
+    n_samples = _n_rows(ds.data)
+    if n_samples < n_seen:
+        raise ModelNotUpdatable(f'{model_name}: dataset has shrunk ({n_seen} -> {n_samples} rows)')
+    if n_samples == n_seen:
+        raise ModelNotUpdatable(f'{model_name}: dataset has no new rows')
+    prefix = slice(0, n_seen)
+    # the full dataset's hashes may already be recorded in its metadata
+    n_hashed = n_seen + (n_samples if _recorded_hashes(ds, hash_type) is None else 0)
+    with profile_phase(profile, 'hash', n_rows=n_hashed):
+        prefix_hashes = {
+            'data_hash': joblib.hash(_take_rows(ds.data, prefix), hash_name=hash_type,
+                                     coerce_mmap=True),
+            'target_hash': joblib.hash(_take_rows(ds.target, prefix), hash_name=hash_type,
+                                       coerce_mmap=True),
+        }
+        if any(prefix_hashes[k] != metadata[k] for k in prefix_hashes):
+            raise ModelNotUpdatable(f'{model_name}: the first {n_seen} rows of the dataset have changed')
+        data_hashes = dataset_hashes(ds, hash_type=hash_type)
+
+    saved_params = metadata.get('algorithm_params', {})
+    if algorithm_params is None:
+        algorithm_params = {}
+    params_changed = any(saved_params.get(k, None) != v for k, v in algorithm_params.items())
+    if hasattr(model, 'partial_fit') and not params_changed:
+        method = 'partial_fit'
+    elif 'warm_start' in model.get_params():
+        method = 'warm_start'
+        n_estimators = model.get_params().get('n_estimators', None)
+        if (n_estimators is not None and
+                algorithm_params.get('n_estimators', n_estimators) <= n_estimators):
+            # warm-started ensembles only fit new members
+            raise ModelNotUpdatable(f'{model_name}: increase `n_estimators` to update this ensemble')
+    else:
+        raise ModelNotUpdatable(f'{model_name}: estimator supports neither `partial_fit` '
+                        'nor `warm_start`')
+
+    start_time = time.time()
+    if method == 'partial_fit':
+        with _capped_n_jobs(model, max_n_jobs), \
+                profile_phase(profile, 'fit', n_rows=(n_samples - n_seen) * n_epochs):
+            partial_fit_blocks(model, ds.data, ds.target, start=n_seen, block_size=block_size,
+                               n_epochs=n_epochs, shuffle=shuffle, random_state=shuffle_seed)
+    else:
+        warm_start = model.get_params()['warm_start']
+        params = {k:v for k, v in algorithm_params.items() if k != 'warm_start'}
+        model.set_params(**params, warm_start=True)
+        with _capped_n_jobs(model, max_n_jobs), profile_phase(profile, 'fit', n_rows=n_samples):
+            model.fit(ds.data, y=ds.target)
+        model.set_params(warm_start=warm_start)
+    end_time = record_time_interval('update_model', start_time)
+
+    lineage = metadata.get('lineage', None) or [
+        {'data_hash': metadata['data_hash'], 'target_hash': metadata['target_hash'],
+         'n_samples': n_seen, 'method': 'fit'}]
+    lineage = lineage + [{**data_hashes, 'n_samples': n_samples, 'method': method,
+                          'start_time': start_time, 'duration': end_time - start_time}]
+    metadata = {**metadata, **data_hashes,
+                'algorithm_params': dict(model.get_params()),
+                'hash_type': hash_type,
+                'n_samples': n_samples,
+                'start_time': start_time,
+                'duration': end_time - start_time,
+                'lineage': lineage,
+                'profile': profile}
+    logger.debug(f'{model_name}: updated with {n_samples - n_seen} new rows ({method})')
+    return model, metadata
+
+
+def save_model(metadata=None, model_path=None, hash_type='sha1', compress=0,
                *, model_name, model):
     """Save a model to disk
 
@@ -53,11 +422,25 @@ def save_model(metadata=None, model_path=None, hash_type='sha1',
         hash algorithm to use for joblib hashing
     model_path: path, default `trained_model_path`
         Where model should be saved.
+    compress: int (0-9), str, or tuple
+        compression passed to `joblib.dump`, e.g. 3 or ('lz4', 3).
+        Compressed models are smaller on disk, but can't be memory-mapped
+        when loaded. By default, the model is saved uncompressed, with its
+        numpy arrays stored (aligned) in the file, so that `load_model` can
+        memory-map them.
+
+    The model hash (`model_hash`) is computed from the bytes of the saved
+    model file, and stored in the metadata along with the file's size and
+    modification time (see `saved_model_hash`). The resources used in saving
+    (and hashing) the model are recorded as the `save` phase of the
+    `profile` metadata.
 
     Returns
     -------
     copy of metadata
     """
+    import joblib
+
     if metadata is None:
         metadata = {}
     else:
@@ -68,13 +451,67 @@ def save_model(metadata=None, model_path=None, hash_type='sha1',
     else:
         model_path = pathlib.Path(model_path)
 
-    joblib.dump(model, model_path / f"{model_name}.model")
-    metadata['model_hash'] = joblib.hash(model, hash_name=hash_type)
+    fq_model = model_path / f"{model_name}.model"
+    metadata['profile'] = dict(metadata.get('profile', None) or {})
+    with profile_phase(metadata['profile'], 'save'):
+        joblib.dump(model, fq_model, compress=compress)
+        metadata.update(_model_file_hash(fq_model, hash_type))
+    metadata['compress'] = compress
     save_json(model_path / f"{model_name}.metadata", metadata)
     return metadata
 
 
-def load_model(model_name=None, metadata_only=False, model_path=None):
+def _model_file_hash(fq_model, hash_type):
+    """Hash a saved model file, noting the file stats the hash is valid for"""
+    stat = fq_model.stat()
+    return {
+        'model_hash': hash_file(fq_model, algorithm=hash_type, block_size=2**20).hexdigest(),
+        'model_hash_type': hash_type,
+        'model_file_size': stat.st_size,
+        'model_file_mtime': stat.st_mtime_ns,
+    }
+
+
+def saved_model_hash(model_name, hash_type='sha1', model_path=None, metadata=None):
+    """Hash of a saved model file
+
+    The hash recorded by `save_model` is reused as long as the model file
+    has the size and modification time it had when saved, and `hash_type`
+    matches. Otherwise, the file is hashed again.
+
+    Parameters
+    ----------
+    model_name: str
+        name of the saved model
+    hash_type: {'sha1', 'md5', 'sha256'}
+        hash algorithm to use
+    model_path: path, default `trained_model_path`
+        where the model is saved
+    metadata: dict or None
+        the model's metadata, if already loaded
+
+    Returns
+    -------
+    hex digest of the model file
+    """
+    if model_path is None:
+        model_path = trained_model_path
+    else:
+        model_path = pathlib.Path(model_path)
+    if metadata is None:
+        metadata = load_model(model_name, model_path=model_path, metadata_only=True)
+
+    fq_model = model_path / f'{model_name}.model'
+    stat = fq_model.stat()
+    if (metadata.get('model_hash_type', None) == hash_type and
+            metadata.get('model_file_size', None) == stat.st_size and
+            metadata.get('model_file_mtime', None) == stat.st_mtime_ns):
+        return metadata['model_hash']
+    logger.debug(f'{model_name}: model file has changed since its hash was recorded. Rehashing.')
+    return _model_file_hash(fq_model, hash_type)['model_hash']
+
+
+def load_model(model_name=None, metadata_only=False, model_path=None, mmap_mode=None):
     """Load a model (or model metadata)
 
     Parameters
@@ -83,6 +520,11 @@ def load_model(model_name=None, metadata_only=False, model_path=None):
         If True, just return the model metadata.
     model_path:
     model_name:
+    mmap_mode: {None, 'r+', 'r', 'w+', 'c'}
+        If not None, numpy arrays in the model (e.g. the coefficients of a
+        linear model) are memory-mapped from disk rather than read into memory.
+        Ignored for compressed models. Note that tree estimators copy their
+        node arrays when unpickled, so this mostly helps other estimators.
 
     Returns
     -------
@@ -115,6 +557,11 @@ def load_model(model_name=None, metadata_only=False, model_path=None):
     if not fq_model.exists():
         raise FileNotFoundError(f"Could not find model: {model_name}")
 
-    model = joblib.load(fq_model)
+    if mmap_mode is not None and model_metadata.get('compress', 0):
+        logger.debug(f"{model_name} is compressed, and can't be memory-mapped")
+        mmap_mode = None
+
+    import joblib
+    model = joblib.load(fq_model, mmap_mode=mmap_mode)
 
     return model, model_metadata
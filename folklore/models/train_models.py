@@ -6,9 +6,16 @@ from pathlib import Path
 from dotenv import find_dotenv, load_dotenv
 
 from ..logging import logger
-from ..utils import save_json
+from ..utils import resolve_n_jobs, save_json
 from ..paths import model_path, trained_model_path
-from .model_list import build_models
+from .model_list import build_models, describe_plan, plan_models
+
+def _check_jobs(ctx, param, value):
+    try:
+        resolve_n_jobs(value)
+    except ValueError as err:
+        raise click.BadParameter(str(err))
+    return value
 
 @click.command()
 @click.argument('model_list')
@@ -16,7 +23,18 @@ from .model_list import build_models
               default='trained_models.json')
 @click.option('--hash-type', '-H', type=click.Choice(['md5', 'sha1']),
               default='sha1')
-def main(model_list, *, output_file, hash_type):
+@click.option('--jobs', '-j', type=int, default=1, callback=_check_jobs,
+              help='Number of models to train in parallel (-1 for all CPUs)')
+@click.option('--incremental', '-i', is_flag=True,
+              help='Only train models that are new, or whose inputs have changed')
+@click.option('--update', '-u', is_flag=True,
+              help='Update stale models with new data (partial_fit/warm_start) where possible')
+@click.option('--compress', '-z', type=click.IntRange(0, 9), default=0,
+              help='zlib compression level for saved models (compressed models cannot be memory-mapped)')
+@click.option('--dry-run', '-n', is_flag=True,
+              help='Print the training plan (with estimated durations) without training')
+def main(model_list, *, output_file, hash_type, jobs, incremental, update, compress,
+         dry_run):
     """Trains models speficied in the supplied `model_list` file
 
     output is a dictionary of trained model metadata keyed by
@@ -31,6 +49,10 @@ def main(model_list, *, output_file, hash_type):
 
     The combination of these 3 things must be unique.
 
+    If any models were trained, the output also has a `profile_summary`
+    entry: the resources used by each phase of this run's training (see
+    `summarize_profiles`).
+
     trained models are written to `trained_model_path`.
 
     For every model, we write:
@@ -49,18 +71,39 @@ def main(model_list, *, output_file, hash_type):
         name of json file to write metadata to
     hash_name: {'sha1', 'md5'}
         type of hash to use for caching of python objects
+    jobs: int
+        number of models to train in parallel
+    incremental: boolean
+        if True, skip models that are already up to date
+    update: boolean
+        if True, update stale models incrementally where possible
+    compress: int
+        compression level for saved models
+    dry_run: boolean
+        if True, just print the training plan
 
 
     """
     logger.debug(f'Building models from {model_list}')
 
+    if dry_run:
+        plan = plan_models(model_file=model_list, hash_type=hash_type,
+                           incremental=incremental)
+        click.echo(describe_plan(plan))
+        return
+
     os.makedirs(trained_model_path, exist_ok=True)
 
-    saved_meta = build_models(model_file=model_list, hash_type=hash_type)
+    run_profile = {}
+    saved_meta = build_models(model_file=model_list, hash_type=hash_type, n_jobs=jobs,
+                              incremental=incremental, update=update, compress=compress,
+                              run_profile=run_profile)
 
     logger.debug(f"output dir: {model_path}")
     logger.debug(f"output filename: {output_file}")
     if saved_meta:
+        if run_profile:
+            saved_meta['profile_summary'] = run_profile
         save_json(model_path / output_file, saved_meta)
         logger.info("Training complete! Access results via workflow.available_models()")
 
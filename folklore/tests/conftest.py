@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from folklore.data import Dataset
+
+
+@pytest.fixture
+def toy_dataset():
+    """Factory for small random Datasets
+
+    The rows don't depend on `n_samples`, so a larger toy dataset is
+    a smaller one with rows appended.
+    """
+    def make(n_samples=1000, name='toy', n_features=4):
+        data = np.random.RandomState(0).rand(n_samples, n_features)
+        target = np.random.RandomState(1).randint(2, size=n_samples)
+        return Dataset(dataset_name=name, data=data, target=target)
+    return make
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import time
+
+from folklore.data.cache import DatasetCache
+
+
+def _write_entry(cache, key, size=100):
+    (cache.cache_path / f'{key}.dataset').write_bytes(b'x' * size)
+    (cache.cache_path / f'{key}.metadata').write_bytes(b'')
+
+
+def _add_entries(cache_path, prefix, n_entries):
+    cache = DatasetCache(cache_path=cache_path)
+    for i in range(n_entries):
+        key = f'{prefix}_{i}'
+        cache.reserve(key)
+        _write_entry(cache, key)
+        cache.add(key)
+
+
+def test_lru_eviction(tmp_path):
+    cache = DatasetCache(cache_path=tmp_path, max_bytes=250)
+    for key in ['a', 'b', 'c']:
+        _write_entry(cache, key)
+        cache.add(key)
+        time.sleep(0.01)
+    # 'b' and 'c' fit; 'a' is the least recently used
+    assert sorted(cache.entries()) == ['b', 'c']
+
+    cache.touch('b')
+    _write_entry(cache, 'd')
+    cache.add('d')
+    assert sorted(cache.entries()) == ['b', 'd']
+    assert cache.stats()['total_bytes'] == 200
+
+
+def test_age_eviction(tmp_path):
+    cache = DatasetCache(cache_path=tmp_path)
+    for key in ['old', 'new']:
+        _write_entry(cache, key)
+        cache.add(key)
+    an_hour_ago = time.time() - 3600
+    for file_fq in cache._files('old'):
+        os.utime(file_fq, (an_hour_ago, an_hour_ago))
+
+    assert cache.prune(max_age=60) == ['old']
+    assert sorted(cache.entries()) == ['new']
+
+
+def test_touch_doesnt_rewrite_the_index(tmp_path):
+    cache = DatasetCache(cache_path=tmp_path)
+    _write_entry(cache, 'a')
+    cache.add('a')
+    index_fq = tmp_path / cache.index_file
+    before = index_fq.stat().st_mtime_ns
+    an_hour_ago = time.time() - 3600
+    for file_fq in cache._files('a'):
+        os.utime(file_fq, (an_hour_ago, an_hour_ago))
+
+    cache.touch('a')
+
+    assert index_fq.stat().st_mtime_ns == before
+    assert time.time() - cache.entries()['a']['last_access'] < 60
+    cache.touch('missing')  # e.g. evicted by another process
+
+
+def test_prune_keeps_reserved_entries(tmp_path):
+    cache = DatasetCache(cache_path=tmp_path, max_bytes=0)
+    cache.reserve('writing')
+    _write_entry(cache, 'writing')
+    _write_entry(cache, 'done')
+
+    assert cache.prune() == ['done']
+    assert list(cache.entries()) == ['writing']
+
+    cache.add('writing')
+    assert cache.prune() == ['writing']
+
+
+def test_abandoned_reservations_expire(tmp_path):
+    cache = DatasetCache(cache_path=tmp_path, max_bytes=0)
+    cache.reserve('abandoned')
+    _write_entry(cache, 'abandoned')
+    index = cache._load_index()
+    index['abandoned']['last_access'] -= cache.reservation_timeout + 1
+    cache._save_index(index)
+
+    assert cache.prune() == ['abandoned']
+
+
+def test_concurrent_adds_keep_every_entry(tmp_path):
+    ctx = multiprocessing.get_context('spawn')
+    workers = [ctx.Process(target=_add_entries, args=(str(tmp_path), f'w{i}', 20))
+               for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    cache = DatasetCache(cache_path=tmp_path)
+    assert sorted(cache.entries()) == sorted(f'w{i}_{j}' for i in range(4) for j in range(20))
+    # every reservation was ended by its add
+    assert cache._load_index() == {}
@@ -0,0 +1,126 @@
+import importlib
+import os
+import subprocess
+import sys
+import types
+from functools import partial
+
+import numpy as np
+import pytest
+
+from folklore.data.utils import deserialize_partial, function_fingerprint, reservoir_sample
+from folklore.paths import project_dir
+from folklore.utils import line_partitions
+
+
+def test_function_defined_after_failed_lookup_is_found(monkeypatch):
+    module = types.ModuleType('folklore_test_loaders')
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    func_dict = {'load_function_module': module.__name__,
+                 'load_function_name': 'load_toy'}
+
+    # not defined yet: falls back to the default processing function
+    assert deserialize_partial(func_dict).func.__name__ == 'process_dataset_default'
+
+    module.load_toy = lambda: 'toy'
+    assert deserialize_partial(func_dict)() == 'toy'
+
+
+@pytest.fixture
+def numbered_lines(tmp_path):
+    filename = tmp_path / 'lines.txt'
+    filename.write_text(''.join(f'line {i}\n' for i in range(1000)))
+    return filename
+
+
+@pytest.mark.parametrize('n_jobs', [1, 3])
+def test_reservoir_sample_is_reproducible(numbered_lines, n_jobs):
+    sample = reservoir_sample(numbered_lines, n_samples=50, random_seed=42, n_jobs=n_jobs,
+                              block_size=256)
+    assert sample == reservoir_sample(numbered_lines, n_samples=50, random_seed=42,
+                                      n_jobs=n_jobs, block_size=256)
+    assert sample != reservoir_sample(numbered_lines, n_samples=50, random_seed=43,
+                                      n_jobs=n_jobs, block_size=256)
+    assert len(set(sample)) == 50
+    assert set(sample) <= {f'line {i}' for i in range(1000)}
+
+
+@pytest.mark.parametrize('n_jobs', [1, 3])
+def test_reservoir_sample_small_files(tmp_path, numbered_lines, n_jobs):
+    empty = tmp_path / 'empty.txt'
+    empty.write_text('')
+    assert reservoir_sample(empty, n_samples=5, n_jobs=n_jobs) == []
+
+    sample = reservoir_sample(numbered_lines, n_samples=2000, random_seed=0, n_jobs=n_jobs)
+    assert sorted(sample) == sorted(f'line {i}' for i in range(1000))
+
+
+def test_reservoir_sample_is_uniform(numbered_lines):
+    # every line should be picked about as often, whichever range it falls in
+    counts = np.zeros(1000)
+    for seed in range(40):
+        for line in reservoir_sample(numbered_lines, n_samples=100, random_seed=seed, n_jobs=4,
+                                     block_size=512):
+            counts[int(line.split()[1])] += 1
+    assert counts.sum() == 4000
+    assert abs(counts[:500].sum() - counts[500:].sum()) < 400
+
+
+@pytest.mark.parametrize('by', ['lines', 'bytes'])
+def test_line_partitions_cover_the_file(numbered_lines, by):
+    ranges = line_partitions(numbered_lines, 3, by=by)
+    contents = numbered_lines.read_bytes()
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(contents)
+    assert all(stop == start for (_, stop), (start, _) in zip(ranges, ranges[1:]))
+    assert all(contents[stop - 1:stop] == b'\n' for _, stop in ranges)
+
+
+_LOADERS = '''
+def helper():
+    return {HELPER}
+
+def load(**kwargs):
+    return helper()
+
+class Loader:
+    def __init__(self, scale):
+        self.scale = scale
+
+    def __call__(self, **kwargs):
+        return self.scale * helper()
+'''
+
+
+@pytest.fixture
+def loaders(tmp_path, monkeypatch):
+    """A module of load functions, `fingerprint_loaders`, which can be edited"""
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module_fq = tmp_path / 'fingerprint_loaders.py'
+
+    def write(helper_value):
+        module_fq.write_text(_LOADERS.replace('{HELPER}', repr(helper_value)))
+        sys.modules.pop('fingerprint_loaders', None)
+        return importlib.import_module('fingerprint_loaders')
+    yield write
+    sys.modules.pop('fingerprint_loaders', None)
+
+
+def test_fingerprint_changes_with_helpers(loaders):
+    before = function_fingerprint(loaders(1).load)
+    assert function_fingerprint(partial(loaders(1).load, x=1)) == before
+    assert function_fingerprint(loaders(2).load) != before
+
+
+def test_fingerprint_of_callable_instances(loaders, tmp_path):
+    module = loaders(1)
+    fingerprint = function_fingerprint(module.Loader(3))
+    assert function_fingerprint(module.Loader(3)) == fingerprint
+    assert function_fingerprint(module.Loader(4)) != fingerprint
+
+    # the same in another process (no memory addresses in the fingerprint)
+    code = ('import fingerprint_loaders; from folklore.data.utils import function_fingerprint; '
+            'print(function_fingerprint(fingerprint_loaders.Loader(3)))')
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([str(tmp_path), str(project_dir)])}
+    result = subprocess.run([sys.executable, '-c', code], env=env, cwd=tmp_path,
+                            stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    assert result.stdout.strip() == fingerprint
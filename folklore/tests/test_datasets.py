@@ -0,0 +1,60 @@
+import pytest
+
+from folklore.data import RawDataset, datasets, fetch
+
+
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch, 'raw_data_path', tmp_path)
+    (tmp_path / 'toy.csv').write_text('1,2\n3,4\n')
+    return tmp_path
+
+
+def _raw_dataset(raw_dir):
+    return RawDataset(name='toy', dataset_dir=raw_dir,
+                      file_list=[{'file_name': 'toy.csv', 'hash_type': 'sha1'}])
+
+
+def _count_fetches(monkeypatch):
+    calls = []
+    fetch_file = datasets.fetch_file
+
+    def spy(**item):
+        calls.append(item['file_name'])
+        return fetch_file(**item)
+    monkeypatch.setattr(datasets, 'fetch_file', spy)
+    return calls
+
+
+def test_fetch_state_is_shared_between_instances(raw_dir, monkeypatch):
+    first = _raw_dataset(raw_dir)
+    assert first.fetch()
+    assert first.state_file_.exists()
+
+    calls = _count_fetches(monkeypatch)
+    second = _raw_dataset(raw_dir)
+    assert second.fetch()
+    assert calls == []
+    assert second.fetched_files_ == first.fetched_files_
+    assert second.file_list[0]['hash_value'] == first.file_list[0]['hash_value']
+
+
+def test_fetch_state_ignored_when_file_changes(raw_dir, monkeypatch):
+    first = _raw_dataset(raw_dir)
+    first.fetch()
+    (raw_dir / 'toy.csv').write_text('1,2\n3,4\n5,6\n')
+
+    calls = _count_fetches(monkeypatch)
+    assert _raw_dataset(raw_dir).fetch()
+    assert calls == ['toy.csv']
+
+
+def test_fetch_state_ignored_when_file_list_changes(raw_dir, monkeypatch):
+    _raw_dataset(raw_dir).fetch()
+    (raw_dir / 'extra.csv').write_text('7,8\n')
+
+    calls = _count_fetches(monkeypatch)
+    changed = _raw_dataset(raw_dir)
+    changed.file_list.append({'file_name': 'extra.csv', 'hash_type': 'sha1'})
+    assert changed.fetch()
+    assert calls == ['toy.csv', 'extra.csv']
@@ -0,0 +1,251 @@
+import pytest
+from click.testing import CliRunner
+from sklearn.linear_model import SGDClassifier
+
+from folklore.data import datasets
+from folklore.models import model_list, sweep, train
+from folklore.models.model_list import build_models
+from folklore.models.train_models import main as train_models_main
+from folklore.utils import save_json
+
+
+@pytest.mark.parametrize('n_jobs', [0, -2, 1.5])
+def test_build_models_rejects_bad_n_jobs(n_jobs):
+    with pytest.raises(ValueError, match='n_jobs'):
+        build_models(n_jobs=n_jobs)
+
+
+def test_train_models_rejects_bad_jobs():
+    result = CliRunner().invoke(train_models_main, ['model_list.json', '--jobs', '0'])
+    assert result.exit_code != 0
+    assert 'n_jobs must be a positive integer' in result.output
+
+
+def _save_trained_model(monkeypatch, model_path, dataset, **training_options):
+    monkeypatch.setattr(train, 'available_algorithms',
+                        lambda keys_only=True: {'SGD': SGDClassifier()})
+    td = {'dataset_name': 'toy', 'algorithm_name': 'SGD',
+          'algorithm_params': {'random_state': 0, 'n_jobs': -1}, **training_options}
+    model, metadata = train.train_model(hash_type='sha1', dataset=dataset, **td)
+    train.save_model(model_name='sgd_toy', model=model, metadata={**td, **metadata},
+                     model_path=model_path)
+
+
+def test_update_model_fits_appended_rows(monkeypatch, tmp_path, toy_dataset):
+    _save_trained_model(monkeypatch, tmp_path, toy_dataset(600), block_size=100)
+
+    model, metadata = train.update_model('sgd_toy', model_path=tmp_path,
+                                         dataset=toy_dataset(1000), block_size=100)
+
+    assert metadata['n_samples'] == 1000
+    assert [step['method'] for step in metadata['lineage']] == ['fit', 'partial_fit']
+    assert metadata['profile']['fit']['rows_per_s'] > 0
+
+
+def test_update_model_refuses_unchanged_data(monkeypatch, tmp_path, toy_dataset):
+    _save_trained_model(monkeypatch, tmp_path, toy_dataset(600))
+    with pytest.raises(train.ModelNotUpdatable, match='no new rows'):
+        train.update_model('sgd_toy', model_path=tmp_path, dataset=toy_dataset(600))
+
+
+def test_update_model_refuses_changed_training_options(monkeypatch, tmp_path, toy_dataset):
+    _save_trained_model(monkeypatch, tmp_path, toy_dataset(600), block_size=100)
+    with pytest.raises(train.ModelNotUpdatable, match='training options have changed'):
+        train.update_model('sgd_toy', model_path=tmp_path, dataset=toy_dataset(1000),
+                           block_size=100, n_epochs=2)
+
+
+def test_update_model_refuses_changed_prefix(monkeypatch, tmp_path, toy_dataset):
+    _save_trained_model(monkeypatch, tmp_path, toy_dataset(600))
+    changed = toy_dataset(1000)
+    changed.data[0, 0] += 1
+    with pytest.raises(train.ModelNotUpdatable, match='first 600 rows'):
+        train.update_model('sgd_toy', model_path=tmp_path, dataset=changed)
+
+
+def test_train_and_save_forwards_options_to_update(monkeypatch, tmp_path, toy_dataset):
+    monkeypatch.setattr(train, 'trained_model_path', tmp_path)
+    training_options = {'block_size': 100, 'n_epochs': 2, 'shuffle': True, 'shuffle_seed': 0}
+    _save_trained_model(monkeypatch, tmp_path, toy_dataset(600), **training_options)
+    fits = []
+    partial_fit_blocks = train.partial_fit_blocks
+
+    def spy(model, *args, **kwargs):
+        fits.append((model.n_jobs, kwargs))
+        return partial_fit_blocks(model, *args, **kwargs)
+    monkeypatch.setattr(train, 'partial_fit_blocks', spy)
+
+    td = {'dataset_name': 'toy', 'algorithm_name': 'SGD',
+          'algorithm_params': {'random_state': 0, 'n_jobs': -1}, **training_options}
+    _, metadata = model_list._train_and_save('sgd_toy', td, 'sha1', update=True,
+                                             dataset=toy_dataset(1000), max_n_jobs=1)
+
+    assert [step['method'] for step in metadata['lineage']] == ['fit', 'partial_fit']
+    n_jobs, kwargs = fits[-1]
+    assert n_jobs == 1
+    assert kwargs['start'] == 600
+    assert (kwargs['block_size'], kwargs['n_epochs'], kwargs['shuffle'],
+            kwargs['random_state']) == (100, 2, True, 0)
+
+
+def test_dataset_hashes_profile_counts_only_hashed_rows(toy_dataset):
+    ds = toy_dataset(600)
+    profile = {}
+    hashes = train.dataset_hashes(ds, profile=profile)
+    assert 'rows_per_s' not in profile['hash']
+
+    profile = {}
+    assert train.dataset_hashes(ds, hash_type='md5', profile=profile) != hashes
+    assert profile['hash']['rows_per_s'] > 0
+
+
+def test_summarize_profiles_ignores_saved_summary():
+    fit = {'wall_s': 1.0, 'cpu_s': 1.0, 'peak_rss_delta_bytes': 10, 'rows_per_s': 5.0}
+    trained_models = {'a': {'profile': {'fit': fit}}}
+    trained_models['profile_summary'] = model_list.summarize_profiles(trained_models)
+    assert model_list.summarize_profiles(trained_models) == trained_models['profile_summary']
+
+
+def test_update_model_warm_start_with_saved_params(monkeypatch, tmp_path, toy_dataset):
+    from sklearn.ensemble import RandomForestClassifier
+    monkeypatch.setattr(train, 'available_algorithms',
+                        lambda keys_only=True: {'RF': RandomForestClassifier()})
+    td = {'dataset_name': 'toy', 'algorithm_name': 'RF',
+          'algorithm_params': {'n_estimators': 5, 'random_state': 0}}
+    model, metadata = train.train_model(hash_type='sha1', dataset=toy_dataset(600), **td)
+    # as saved by build_models: the full set of parameters, including warm_start
+    td['algorithm_params'] = dict(model.get_params())
+    train.save_model(model_name='rf_toy', model=model, metadata={**td, **metadata},
+                     model_path=tmp_path)
+
+    model, metadata = train.update_model('rf_toy', {**td['algorithm_params'], 'n_estimators': 8},
+                                         model_path=tmp_path, dataset=toy_dataset(1000))
+
+    assert len(model.estimators_) == 8
+    assert model.warm_start is False
+    assert metadata['lineage'][-1]['method'] == 'warm_start'
+
+
+def test_train_and_save_retrains_only_updatable_failures(monkeypatch, tmp_path, toy_dataset):
+    monkeypatch.setattr(train, 'trained_model_path', tmp_path)
+    _save_trained_model(monkeypatch, tmp_path, toy_dataset(600))
+    td = {'dataset_name': 'toy', 'algorithm_name': 'SGD',
+          'algorithm_params': {'random_state': 0, 'n_jobs': -1}}
+
+    # no new rows: retrained from scratch
+    _, metadata = model_list._train_and_save('sgd_toy', td, 'sha1', update=True,
+                                             dataset=toy_dataset(600))
+    assert [step['method'] for step in metadata['lineage']] == ['fit']
+
+    def broken_update(*args, **kwargs):
+        raise TypeError('bug')
+    monkeypatch.setattr(model_list, 'update_model', broken_update)
+    with pytest.raises(TypeError):
+        model_list._train_and_save('sgd_toy', td, 'sha1', update=True,
+                                   dataset=toy_dataset(1000))
+
+
+def test_train_and_save_hashes_model_with_hash_type(monkeypatch, tmp_path, toy_dataset):
+    monkeypatch.setattr(train, 'trained_model_path', tmp_path)
+    monkeypatch.setattr(train, 'available_algorithms',
+                        lambda keys_only=True: {'SGD': SGDClassifier()})
+    td = {'dataset_name': 'toy', 'algorithm_name': 'SGD', 'algorithm_params': {}}
+
+    _, metadata = model_list._train_and_save('sgd_toy', td, 'md5', dataset=toy_dataset(600))
+
+    assert metadata['hash_type'] == metadata['model_hash_type'] == 'md5'
+    assert train.saved_model_hash('sgd_toy', hash_type='md5', model_path=tmp_path,
+                                  metadata=metadata) == metadata['model_hash']
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch, toy_dataset):
+    """A model list of two models (on datasets 'toy' and 'other'), with
+    datasets and trained models kept in `tmp_path`"""
+    processed, trained = tmp_path / 'processed', tmp_path / 'trained'
+    trained.mkdir()
+    monkeypatch.setattr(datasets, 'processed_data_path', processed)
+    for module in [model_list, train, sweep]:
+        monkeypatch.setattr(module, 'trained_model_path', trained)
+    algorithms = lambda keys_only=True: {'SGD': SGDClassifier()}
+    monkeypatch.setattr(model_list, 'available_algorithms', algorithms)
+    monkeypatch.setattr(train, 'available_algorithms', algorithms)
+
+    toy_dataset(600).dump()
+    toy_dataset(600, name='other').dump()
+    save_json(tmp_path / 'model_list.json', [
+        {'dataset_name': name, 'algorithm_name': 'SGD', 'run_number': 0,
+         'algorithm_params': {'random_state': 0}}
+        for name in ['toy', 'other']])
+    return tmp_path
+
+
+def _statuses(project):
+    return {job['model_key']: job['status']
+            for job in model_list.plan_models(model_dir=project, incremental=True)}
+
+
+def _count_trainings(monkeypatch):
+    trained = []
+    train_model = model_list.train_model
+
+    def spy(**kwargs):
+        trained.append(kwargs['dataset_name'])
+        return train_model(**kwargs)
+    monkeypatch.setattr(model_list, 'train_model', spy)
+    return trained
+
+
+def test_incremental_rebuild_skips_current_models(project, monkeypatch):
+    assert _statuses(project) == {'SGD_toy_0': 'new', 'SGD_other_0': 'new'}
+    first = build_models(model_dir=project, incremental=True)
+    assert sorted(first) == ['SGD_other_0', 'SGD_toy_0']
+    assert _statuses(project) == {'SGD_toy_0': 'current', 'SGD_other_0': 'current'}
+
+    trained = _count_trainings(monkeypatch)
+    second = build_models(model_dir=project, incremental=True)
+    assert trained == []
+    assert {k: meta['start_time'] for k, meta in second.items()} == \
+        {k: meta['start_time'] for k, meta in first.items()}
+
+
+def test_changed_param_marks_only_that_model_stale(project, monkeypatch):
+    build_models(model_dir=project, incremental=True)
+    entries = model_list.get_model_list(model_dir=project)
+    entries[1]['algorithm_params']['alpha'] = 0.01
+    save_json(project / 'model_list.json', entries)
+
+    plan = model_list.plan_models(model_dir=project, incremental=True)
+    assert {job['model_key']: (job['status'], job['train']) for job in plan} == \
+        {'SGD_toy_0': ('current', False), 'SGD_other_0': ('stale', True)}
+    lines = model_list.describe_plan(plan).splitlines()
+    assert [line.split()[:3] for line in lines[1:3]] == \
+        [['SGD_toy_0', 'current', 'skip'], ['SGD_other_0', 'stale', 'train']]
+    assert lines[-1].startswith('1 to train')
+
+    trained = _count_trainings(monkeypatch)
+    build_models(model_dir=project, incremental=True)
+    assert trained == ['other']
+
+
+def test_changed_dataset_marks_its_models_stale(project, toy_dataset):
+    build_models(model_dir=project, incremental=True)
+    changed = toy_dataset(600)
+    changed.data[0, 0] += 1
+    changed.dump(force=True)
+    assert _statuses(project) == {'SGD_toy_0': 'stale', 'SGD_other_0': 'current'}
+
+
+def test_stale_models_are_updated_only_with_appended_rows(project, toy_dataset):
+    build_models(model_dir=project, incremental=True)
+
+    toy_dataset(1000).dump(force=True)
+    rebuilt = build_models(model_dir=project, incremental=True, update=True)
+    assert [step['method'] for step in rebuilt['SGD_toy_0']['lineage']] == ['fit', 'partial_fit']
+    assert rebuilt['SGD_toy_0']['n_samples'] == 1000
+
+    changed = toy_dataset(1000)
+    changed.data[0, 0] += 1
+    changed.dump(force=True)
+    rebuilt = build_models(model_dir=project, incremental=True, update=True)
+    assert [step['method'] for step in rebuilt['SGD_toy_0']['lineage']] == ['fit']
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from folklore.data import Dataset
+from folklore.models import sweep
+
+
+def test_expand_grid():
+    td = {'dataset_name': 'toy', 'algorithm_name': 'Tree', 'run_number': 0,
+          'algorithm_params': {'random_state': 0},
+          'param_grid': {'max_depth': [1, 2], 'criterion': ['gini', 'entropy']}}
+    expanded = sweep.expand_sweep(td)
+    assert [model['sweep_index'] for model in expanded] == [0, 1, 2, 3]
+    assert all(model['algorithm_params']['random_state'] == 0 for model in expanded)
+    assert sorted((m['algorithm_params']['criterion'], m['algorithm_params']['max_depth'])
+                  for m in expanded) == [('entropy', 1), ('entropy', 2), ('gini', 1), ('gini', 2)]
+    assert not any('param_grid' in model for model in expanded)
+
+
+def test_expand_distributions_is_reproducible():
+    td = {'dataset_name': 'toy', 'algorithm_name': 'Tree', 'n_iter': 5,
+          'param_distributions': {'max_depth': {'distribution': 'randint', 'args': [1, 10]},
+                                  'criterion': ['gini', 'entropy']}}
+    expanded = sweep.expand_sweep(td)
+    assert len(expanded) == 5
+    assert expanded == sweep.expand_sweep(td)
+    assert all(type(model['algorithm_params']['max_depth']) is int for model in expanded)
+
+
+def test_expand_rejects_invalid_sweeps():
+    with pytest.raises(Exception, match='requires'):
+        sweep.expand_sweep({'halving': {}})
+    with pytest.raises(Exception, match='only one'):
+        sweep.expand_sweep({'param_grid': {'a': [1]}, 'param_distributions': {'a': [1]}})
+    with pytest.raises(Exception, match='Unknown distribution'):
+        sweep.expand_sweep({'param_distributions': {'a': {'distribution': 'nope'}}})
+
+
+def test_select_candidates_records_ranking(monkeypatch, tmp_path):
+    rng = np.random.RandomState(0)
+    data = rng.rand(300, 2)
+    target = (data[:, 0] + data[:, 1] > 1).astype(int)
+    monkeypatch.setattr(sweep.Dataset, 'load',
+                        lambda *args, **kwargs: Dataset(dataset_name='toy', data=data,
+                                                        target=target))
+    monkeypatch.setattr(sweep, 'available_algorithms',
+                        lambda keys_only=True: {'Tree': DecisionTreeClassifier()})
+    td = {'dataset_name': 'toy', 'algorithm_name': 'Tree', 'run_number': 0,
+          'param_grid': {'max_depth': [1, 2, 4, 8], 'random_state': [0]}}
+    jobs = [{'model_key': f"Tree_toy_0_{model['sweep_index']}", 'training_dict': model,
+             'halving': {'n_promote': 2, 'factor': 2}, 'sweep_fingerprint': 'abc'}
+            for model in sweep.expand_sweep(td)]
+
+    promoted = sweep.select_candidates('Tree_toy_0', jobs, model_path=tmp_path)
+
+    assert len(promoted) == 2
+    record = sweep.load_sweep_record('Tree_toy_0', model_path=tmp_path)
+    assert record['promoted'] == promoted
+    assert record['fingerprint'] == 'abc'
+    assert sorted(r['model_key'] for r in record['ranking']) == [job['model_key'] for job in jobs]
+    assert sweep.load_sweep_record('missing', model_path=tmp_path) is None
@@ -0,0 +1,82 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from folklore.data import Dataset
+from folklore.data.transformers import (blocked_train_test_split, fast_pivot_supported, pivot,
+                                        split_dataset_kfold)
+
+
+def test_blocked_split_hashes_match_loaded_data(tmp_path, toy_dataset):
+    blocked_train_test_split(toy_dataset(), block_size=100, dump_path=tmp_path,
+                             random_state=0)
+    for kind in ['train', 'test']:
+        ds = Dataset.load(f'toy_{kind}', data_path=tmp_path)
+        assert ds.metadata['data_hash'] == joblib.hash(ds.data, hash_name='sha1')
+        assert ds.metadata['target_hash'] == joblib.hash(ds.target, hash_name='sha1')
+
+
+def test_kfold_split_of_mmapped_input_keeps_base(tmp_path, toy_dataset):
+    toy_dataset().dump(dump_path=tmp_path)
+    base_fq = tmp_path / 'toy.dataset'
+    before = base_fq.stat()
+    ds = Dataset.load('toy', data_path=tmp_path, mmap_mode='r')
+    expected = np.array(ds.data)
+
+    split_dataset_kfold(ds, n_splits=3, dump_path=tmp_path)
+
+    after = base_fq.stat()
+    assert (after.st_ino, after.st_size, after.st_mtime_ns) == \
+        (before.st_ino, before.st_size, before.st_mtime_ns)
+    np.testing.assert_array_equal(ds.data, expected)
+    n_rows = 0
+    for fold in range(3):
+        test = Dataset.load(f'toy_fold{fold}_test', data_path=tmp_path)
+        train = Dataset.load(f'toy_fold{fold}_train', data_path=tmp_path)
+        assert len(train.data) + len(test.data) == len(expected)
+        n_rows += len(test.data)
+    assert n_rows == len(expected)
+
+
+def test_dump_over_own_mmapped_file(tmp_path, toy_dataset):
+    toy_dataset().dump(dump_path=tmp_path)
+    ds = Dataset.load('toy', data_path=tmp_path, mmap_mode='r')
+    expected = np.array(ds.data)
+    ds.metadata['descr'] = 'rewritten'
+
+    ds.dump(dump_path=tmp_path)
+
+    np.testing.assert_array_equal(ds.data, expected)
+    reloaded = Dataset.load('toy', data_path=tmp_path)
+    np.testing.assert_array_equal(reloaded.data, expected)
+    assert reloaded.metadata['descr'] == 'rewritten'
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_view_of_rewritten_base_is_rejected(tmp_path, toy_dataset):
+    ds = toy_dataset()
+    ds.dump(dump_path=tmp_path)
+    split_dataset_kfold(ds, n_splits=3, dump_path=tmp_path)
+    Dataset.load('toy_fold0_test', data_path=tmp_path)
+
+    toy_dataset(n_samples=900).dump(dump_path=tmp_path)
+
+    with pytest.raises(Exception, match='stale'):
+        Dataset.load('toy_fold0_test', data_path=tmp_path)
+
+
+@pytest.mark.parametrize('dtype', ['int8', 'int32', 'int64', 'uint64', 'float32', 'float64',
+                                   'Int64', 'bool'])
+@pytest.mark.parametrize('aggfunc', ['sum', 'mean', 'count'])
+def test_auto_pivot_matches_pivot_table(dtype, aggfunc):
+    df = pd.DataFrame({'day': [2, 1, 1, 2, 3], 'item': ['b', 'a', 'b', 'a', 'a'],
+                       'qty': pd.array([1, 2, 3, 4, 5], dtype=dtype)})
+    opts = dict(index='day', columns='item', values='qty', aggfunc=aggfunc)
+    expected = df.pivot_table(**opts)
+
+    pivoted = pivot(Dataset(dataset_name='sales', data=df, target=None), **opts).data
+
+    assert pivoted.equals(expected)
+    assert (pivoted.dtypes == expected.dtypes).all()
+    assert fast_pivot_supported(df, **opts) == (dtype in ['int64', 'float64'])
@@ -0,0 +1,33 @@
+import os
+
+from folklore.utils import load_line_index, read_lines, tail_file
+
+
+def test_line_index_rebuilt_when_file_replaced_with_older_mtime(tmp_path):
+    filename = tmp_path / 'lines.txt'
+    filename.write_text('a\nb\nc\n')
+    assert read_lines(filename, 0) == ['a\n', 'b\n', 'c\n']
+    index_mtime = os.stat(f'{filename}.lineidx.npy').st_mtime
+
+    # e.g. `cp -p` or rsync of an older file
+    filename.write_text('first line\nsecond line\n')
+    os.utime(filename, (index_mtime - 60, index_mtime - 60))
+
+    assert read_lines(filename, 0) == ['first line\n', 'second line\n']
+    assert tail_file(filename, n=1) == 'second line\n'
+
+
+def test_stale_line_index_not_rebuilt_on_request(tmp_path):
+    filename = tmp_path / 'lines.txt'
+    filename.write_text('a\nb\n')
+    load_line_index(filename)
+    stat = filename.stat()
+    filename.write_text('a\nbb\n')
+    os.utime(filename, (stat.st_atime, stat.st_mtime - 60))
+
+    try:
+        load_line_index(filename, rebuild=False)
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError('stale index was used')
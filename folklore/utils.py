@@ -1,10 +1,129 @@
+import contextlib
+import numbers
+import os
 import time
 import pathlib
+import sys
 import numpy as np
 import json
 from .logging import logger
 # Timing and Performance
 
+def peak_rss():
+    """Peak resident set size (memory use) of this process so far, in bytes
+
+    Returns None on platforms without the `resource` module (e.g. Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss
+    return max_rss * 1024
+
+def current_rss():
+    """Resident set size (memory use) of this process right now, in bytes
+
+    Returns None on platforms without `/proc` (e.g. macOS, Windows)
+    """
+    try:
+        with open('/proc/self/statm') as fd:
+            resident_pages = int(fd.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+def resolve_n_jobs(n_jobs):
+    """Number of workers to use for an `n_jobs` option
+
+    `n_jobs` must be a positive integer, or -1 (one worker per CPU).
+
+    Examples
+    --------
+    >>> resolve_n_jobs(2)
+    2
+    >>> resolve_n_jobs(0)
+    Traceback (most recent call last):
+    ...
+    ValueError: n_jobs must be a positive integer, or -1 for all CPUs (got 0)
+    """
+    if n_jobs == -1:
+        return os.cpu_count()
+    if isinstance(n_jobs, bool) or not isinstance(n_jobs, numbers.Integral) or n_jobs < 1:
+        raise ValueError(f'n_jobs must be a positive integer, or -1 for all CPUs (got {n_jobs!r})')
+    return int(n_jobs)
+
+def _reset_peak_rss():
+    """Reset the peak RSS of this process to its current RSS, if possible (Linux only)
+
+    Returns True if the peak was reset
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as fd:
+            fd.write('5')
+    except OSError:
+        return False
+    return True
+
+@contextlib.contextmanager
+def profile_phase(profile, phase, n_rows=None):
+    """Measure the resources used by a block of code
+
+    On exit, `profile[phase]` is set to a dict of:
+
+    wall_s:
+        elapsed (wall-clock) time, in seconds
+    cpu_s:
+        CPU time used by this process (all threads), in seconds
+    peak_rss_delta_bytes:
+        how far memory use rose above its starting level during the block.
+        Where the peak RSS can't be reset (non-Linux platforms), this is
+        only the increase in the process's overall peak. None if memory use
+        can't be measured.
+    rows_per_s:
+        if `n_rows` is given, rows processed per (wall-clock) second
+
+    Phases shouldn't be nested, as each one resets the peak RSS.
+
+    Parameters
+    ----------
+    profile: dict
+        where to record the measurements
+    phase: str
+        name of the phase (key in `profile`)
+    n_rows: int or None
+        number of rows processed in the block
+
+    Examples
+    --------
+    >>> profile = {}
+    >>> with profile_phase(profile, 'sum', n_rows=1000):
+    ...     total = sum(range(1000))
+    >>> sorted(profile['sum'])
+    ['cpu_s', 'peak_rss_delta_bytes', 'rows_per_s', 'wall_s']
+    """
+    if _reset_peak_rss():
+        rss_before = current_rss()
+    else:
+        rss_before = peak_rss()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        wall_s = time.perf_counter() - wall_start
+        stats = {'wall_s': wall_s, 'cpu_s': time.process_time() - cpu_start}
+        max_rss = peak_rss()
+        if rss_before is None or max_rss is None:
+            stats['peak_rss_delta_bytes'] = None
+        else:
+            stats['peak_rss_delta_bytes'] = max(0, max_rss - rss_before)
+        if n_rows is not None:
+            stats['rows_per_s'] = n_rows / wall_s if wall_s > 0 else None
+        profile[phase] = stats
+
 def timing_info(method):
     def wrapper(*args, **kw):
         start_time = time.time()
@@ -67,11 +186,142 @@ def head_file(filename, n=5):
     with open(filename, 'r') as fd:
         lines = []
         for i, line in enumerate(fd):
-            if i > n:
+            if i >= n:
                 break
             lines.append(line)
     return "".join(lines)
 
+def _line_index_filename(filename, index_file=None):
+    if index_file is None:
+        return pathlib.Path(f'{filename}.lineidx.npy')
+    return pathlib.Path(index_file)
+
+def build_line_index(filename, index_file=None, block_size=2**24):
+    """Build an index of line start positions for a file
+
+    The file is scanned once, in binary blocks. The index is a uint64 array
+    of n_lines + 1 byte offsets: the start of every line, followed by the
+    size of the file. It is saved (in .npy format) to `index_file`.
+
+    Parameters
+    ----------
+    filename: path
+        file to index
+    index_file: path or None
+        where to save the index. Default: `{filename}.lineidx.npy`
+    block_size: int
+        size of blocks to read, in bytes
+
+    Returns
+    -------
+    the index, as a numpy array
+    """
+    index_file = _line_index_filename(filename, index_file)
+    offsets = [np.zeros(1, dtype=np.uint64)]
+    position = 0
+    with open(filename, 'rb') as fd:
+        for block in iter(lambda: fd.read(block_size), b""):
+            newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == ord('\n'))
+            offsets.append((newlines + position + 1).astype(np.uint64))
+            position += len(block)
+    offsets = np.concatenate(offsets)
+    if offsets[-1] != position:
+        # last line has no trailing newline
+        offsets = np.append(offsets, np.uint64(position))
+    with open(index_file, 'wb') as fo:
+        np.save(fo, offsets)
+    logger.debug(f"Indexed {len(offsets) - 1} lines of {pathlib.Path(filename).name}")
+    return offsets
+
+def load_line_index(filename, index_file=None, rebuild=True):
+    """Load (memory-mapped) the line index for a file
+
+    If the index is missing, older than the file, or doesn't match the
+    file's size (e.g. the file was replaced by one with an older mtime),
+    it is rebuilt using `build_line_index` (unless `rebuild` is False,
+    in which case a FileNotFoundError is raised).
+
+    Returns
+    -------
+    uint64 array of n_lines + 1 byte offsets (see `build_line_index`)
+    """
+    index_file = _line_index_filename(filename, index_file)
+    file_stat = pathlib.Path(filename).stat()
+    offsets = None
+    if index_file.exists() and index_file.stat().st_mtime >= file_stat.st_mtime:
+        offsets = np.load(index_file, mmap_mode='r')
+        if len(offsets) == 0 or int(offsets[-1]) != file_stat.st_size:
+            offsets = None
+    if offsets is None:
+        if not rebuild:
+            raise FileNotFoundError(f"No up-to-date line index for {filename}")
+        build_line_index(filename, index_file=index_file)
+        offsets = np.load(index_file, mmap_mode='r')
+    return offsets
+
+def read_lines(filename, start, stop=None, index_file=None, encoding='utf-8'):
+    """Read lines `start` to `stop` (exclusive) of a file, using its line index
+
+    Negative `start` and `stop` count from the end of the file, as for
+    python slices. If `stop` is None, read to the end of the file.
+    The read is a single seek, regardless of where the lines are in the file.
+
+    Returns
+    -------
+    list of lines (as strings, including line endings)
+    """
+    offsets = load_line_index(filename, index_file=index_file)
+    start, stop, _ = slice(start, stop).indices(len(offsets) - 1)
+    if stop <= start:
+        return []
+    with open(filename, 'rb') as fd:
+        fd.seek(int(offsets[start]))
+        data = fd.read(int(offsets[stop]) - int(offsets[start]))
+    return data.decode(encoding).splitlines(keepends=True)
+
+def tail_file(filename, n=5, index_file=None):
+    """Return the last `n` lines of a file (using its line index)
+    """
+    if n <= 0:
+        return ""
+    return "".join(read_lines(filename, -n, index_file=index_file))
+
+def line_partitions(filename, n_parts, index_file=None, by='lines'):
+    """Split a file into `n_parts` byte ranges that begin and end on line boundaries
+
+    by: {'lines', 'bytes'}
+        'lines': the ranges hold (nearly) equal numbers of lines. This uses
+        (and if necessary, builds) the file's line index (see `load_line_index`).
+        'bytes': the ranges are (nearly) equal in size. This needs no index:
+        only the lines straddling each boundary are read.
+    index_file: path or None
+        location of the line index (when `by` is 'lines')
+
+    Returns
+    -------
+    list of (start, stop) byte offsets. Each line of the file begins in
+    exactly one range. Ranges may be empty for very small files.
+    """
+    if by == 'lines':
+        offsets = load_line_index(filename, index_file=index_file)
+        n_lines = len(offsets) - 1
+        bounds = [int(offsets[n_lines * i // n_parts]) for i in range(n_parts + 1)]
+    elif by == 'bytes':
+        size = os.path.getsize(filename)
+        bounds = [0]
+        with open(filename, 'rb') as fd:
+            for i in range(1, n_parts):
+                offset = max(size * i // n_parts, bounds[-1])
+                if offset > 0:
+                    fd.seek(offset - 1)
+                    fd.readline()
+                    offset = fd.tell()
+                bounds.append(offset)
+        bounds.append(size)
+    else:
+        raise ValueError(f"by must be 'lines' or 'bytes' (got {by!r})")
+    return list(zip(bounds[:-1], bounds[1:]))
+
 def list_dir(path, fully_qualified=False, glob_pattern='*'):
     """do an ls on a path
 
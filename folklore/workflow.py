@@ -39,23 +39,53 @@ Analyses: make summary
 
 
 '''
-from .data.transformers import available_transformers
-from .models import available_algorithms
-from .models.model_list import (get_model_list, add_model, del_model,
-                                build_models as make_train,
-                                available_models)
-
-from .models.predict import (add_prediction, get_prediction_list,
-                             pop_prediction,
-                             run_predictions as make_predict,
-                             available_predictions)
-from .data import (Dataset, RawDataset, available_datasets, available_raw_datasets, add_raw_dataset,
-                   process_raw_datasets as make_raw)
-from .data.transform_data import (get_transformer_list, add_transformer, del_transformer,
-                                  apply_transforms as make_data)
-from .analysis.analysis import (available_scorers, available_analyses, get_analysis_list,
-                                run_analyses as make_analysis,
-                                add_analysis)
+import importlib
+
+# Workflow commands are imported on first use (see `__getattr__`), so that
+# importing this module doesn't pull in the whole data/model/analysis stack.
+_LAZY_IMPORTS = {
+    # name: (module, attribute)
+    'add_analysis': ('.analysis.analysis', 'add_analysis'),
+    'add_model': ('.models.model_list', 'add_model'),
+    'add_prediction': ('.models.predict', 'add_prediction'),
+    'add_raw_dataset': ('.data', 'add_raw_dataset'),
+    'add_transformer': ('.data.transform_data', 'add_transformer'),
+    'available_algorithms': ('.models', 'available_algorithms'),
+    'available_analyses': ('.analysis.analysis', 'available_analyses'),
+    'available_datasets': ('.data', 'available_datasets'),
+    'available_models': ('.models.model_list', 'available_models'),
+    'available_predictions': ('.models.predict', 'available_predictions'),
+    'available_raw_datasets': ('.data', 'available_raw_datasets'),
+    'available_scorers': ('.analysis.analysis', 'available_scorers'),
+    'available_transformers': ('.data.transformers', 'available_transformers'),
+    'Dataset': ('.data', 'Dataset'),
+    'del_model': ('.models.model_list', 'del_model'),
+    'del_transformer': ('.data.transform_data', 'del_transformer'),
+    'get_analysis_list': ('.analysis.analysis', 'get_analysis_list'),
+    'get_model_list': ('.models.model_list', 'get_model_list'),
+    'get_prediction_list': ('.models.predict', 'get_prediction_list'),
+    'get_transformer_list': ('.data.transform_data', 'get_transformer_list'),
+    'make_analysis': ('.analysis.analysis', 'run_analyses'),
+    'make_data': ('.data.transform_data', 'apply_transforms'),
+    'make_predict': ('.models.predict', 'run_predictions'),
+    'make_raw': ('.data', 'process_raw_datasets'),
+    'make_train': ('.models.model_list', 'build_models'),
+    'pop_prediction': ('.models.predict', 'pop_prediction'),
+    'RawDataset': ('.data', 'RawDataset'),
+}
+
+def __getattr__(name):
+    """Import workflow commands on first access"""
+    try:
+        module_name, attr = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __package__), attr)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
 
 __all__ = [
     'add_analysis',